@@ -0,0 +1,120 @@
+"""Benchmark of the .rec import: reading N synthetic .rec files and building their summary DataFrame
+
+Usage:
+    python benchmarks/bench_rec_summary.py [--sizes 100 1000 5000 20000] [--legacy-max 2000]
+
+Prints the total and per-file time for each size; a linear import keeps the per-file time flat. The legacy
+pipeline (pd.concat per file) is timed up to --legacy-max files for comparison, its per-file time grows with N.
+"""
+
+## Modules
+# Standard library imports
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Third-party imports
+import pandas as pd
+from rich import print
+from tabulate import tabulate
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Local application imports
+from functions.rec_summary import convert_pairs_to_dict, read_rec_file, summarize_rec_files
+
+TAGS = {
+    "OBJ": "10X",
+    "EXC": "LED_BLUE",
+    "LEVEL": "LV9",
+    "EXPO": "40ms",
+    "EMI": "GREEN",
+    "FRAMES": "500p",
+    "FPS": "20Hz",
+    "SLICE": "1R",
+    "AT": "SITE_1",
+    "SENSOR": "iAChSnFR",
+    "CAM_TRIG_MODE": "EXT_EXP_START",
+    "PUMP": "ON",
+}
+
+
+def write_synthetic_recs(directory, start, stop):
+    """.rec files number start to stop - 1, shaped like the camera's: a header, "Comment:", a blank line, the tags"""
+    for i in range(start, stop):
+        tags = dict(TAGS)
+        if i % 7 == 0:
+            tags["NOTE"] = f"note {i}"  # Ad-hoc tag only some files have
+        lines = [
+            f"File: 2024_02_15-{i:05d}.tif",
+            "Date: 2024/02/15",
+            f"Time: {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+            "Comment:",
+            "",
+            *(f"{key}: {value}" for key, value in tags.items()),
+        ]
+        (Path(directory) / f"2024_02_15-{i:05d}.tif.rec").write_text("\n".join(lines), encoding="utf-8")
+
+
+def legacy_summary(list_of_rec_paths):
+    """The former pipeline, growing the DataFrame with pd.concat for every file"""
+    result_of_scanning = pd.DataFrame()
+    rec_filenames = []
+    timestamps = []
+    for rec_path in list_of_rec_paths:
+        filename, timestamp, tags = read_rec_file(rec_path)
+        rec_filenames.append(filename)
+        timestamps.append(timestamp)
+        dict_metadata = convert_pairs_to_dict(f"{key}: {value}" for key, value in tags.items())
+        result_of_scanning = pd.concat([result_of_scanning, pd.DataFrame([dict_metadata])]).reset_index(drop=True)
+    result_of_scanning.insert(0, "Filename", rec_filenames)
+    result_of_scanning.insert(1, "Timestamp", timestamps)
+    return result_of_scanning.replace("None", "")
+
+
+def timed(function, paths):
+    start = time.perf_counter()
+    frame = function(paths)
+    return time.perf_counter() - start, frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the .rec summary import for growing numbers of files")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000, 10000, 20000])
+    parser.add_argument("--legacy-max", type=int, default=2000, help="largest size also timed with pd.concat")
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        written = 0
+        for size in sorted(args.sizes):
+            # Files are shared between sizes, only the missing ones are written
+            if size > written:
+                write_synthetic_recs(temp_dir, written, size)
+                written = size
+            paths = sorted(Path(temp_dir).glob("*.rec"))[:size]
+
+            seconds, frame = timed(summarize_rec_files, paths)
+            assert len(frame) == size
+            row = [size, f"{seconds:.3f}", f"{seconds / size * 1e6:.1f}"]
+            if size <= args.legacy_max:
+                legacy_seconds, _ = timed(legacy_summary, paths)
+                row += [f"{legacy_seconds:.3f}", f"{legacy_seconds / size * 1e6:.1f}"]
+            else:
+                row += ["-", "-"]
+            rows.append(row)
+            print(f"[cyan]{size} files done[/cyan]")
+
+    print(
+        tabulate(
+            rows,
+            headers=["files", "columnar (s)", "per file (us)", "pd.concat (s)", "per file (us)"],
+            tablefmt="pretty",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
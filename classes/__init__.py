@@ -18,14 +18,20 @@ from .dialog_save_template import DialogSaveTemplate
 # Note: DialogInjManager excluded - has cross-package deps, import from classes.dialog_inj_manager directly
 # Helpers
 from .helper_combo_editor import HelperComboEditor
+from .helper_dir_poller import DirPoller
 from .helper_dir_watcher import DirWatcher
+from .helper_scan_task import ScanTask
+from .helper_watch_service import DirScanner, WatchService
 
 # Models
 from .model_checkable_list import ModelCheckableList
 from .model_dynamic_list import ModelDynamicList
 from .model_metadata_form import ModelMetadataForm
+from .model_stacker_jobs import ModelStackerJobs
 
 # Threads
+from .thread_live_stacker import ThreadLiveStacker
+from .thread_rec_import import ThreadRecImport
 from .thread_tiff_stacker import ThreadTiffStacker
 
 __all__ = [
@@ -45,11 +51,18 @@ __all__ = [
     "DialogSaveTemplate",
     # Helpers
     "HelperComboEditor",
+    "DirPoller",
     "DirWatcher",
+    "ScanTask",
+    "DirScanner",
+    "WatchService",
     # Models
     "ModelCheckableList",
     "ModelDynamicList",
     "ModelMetadataForm",
+    "ModelStackerJobs",
     # Threads
+    "ThreadLiveStacker",
+    "ThreadRecImport",
     "ThreadTiffStacker",
 ]
@@ -1,4 +1,5 @@
-from PySide6.QtCore import QEvent, QRect, QSize, Qt
+from PySide6.QtCore import QEvent, QPointF, QRect, QSize, Qt
+from PySide6.QtGui import QImage, QPixmap, QPolygonF
 from PySide6.QtWidgets import (
     QLineEdit,
     QStyle,
@@ -6,7 +7,7 @@ from PySide6.QtWidgets import (
     QStyleOptionButton,
 )
 
-from util.constants import GREEK_REPLACEMENTS
+from util.constants import GREEK_REPLACEMENTS, TIFF_PREVIEW_SIZE, TIFF_PREVIEW_TRACE_WIDTH
 
 
 class DelegateCenterAlign(QStyledItemDelegate):
@@ -44,11 +45,16 @@ class DelegateCellEdit(QStyledItemDelegate):
 
 
 class DelegateCheckableListItem(QStyledItemDelegate):
-    """Delegate to control text positioning in QListView items"""
+    """Delegate to control text positioning in QListView items
 
-    def __init__(self, text_margin=30, parent=None):
+    With show_previews, each item also shows the thumbnail, frame count and mean-intensity trace of its
+    preview (ModelCheckableList.PreviewRole), which the model requests lazily as rows get painted.
+    """
+
+    def __init__(self, text_margin=30, parent=None, show_previews=False):
         super().__init__(parent)
         self.text_margin = text_margin  # Space between checkbox and text
+        self.show_previews = show_previews
 
     def paint(self, painter, option, index):
         """Paint text for list items with proper spacing"""
@@ -93,10 +99,65 @@ class DelegateCheckableListItem(QStyledItemDelegate):
             else option.palette.text().color()
         )
         painter.setPen(text_color)
+        if self.show_previews:
+            text_rect = self.paint_preview(painter, text_rect, index)
         painter.drawText(text_rect, Qt.AlignVCenter, text)
 
         painter.restore()
 
+    def paint_preview(self, painter, rect, index):
+        """Paint the thumbnail on the left and the frame count and trace on the right of rect
+
+        Returns the rect left for the item text.
+        """
+        preview = index.model().data(index, index.model().PreviewRole)
+        thumb_rect = QRect(
+            rect.left(),
+            rect.top() + (rect.height() - TIFF_PREVIEW_SIZE) // 2,
+            TIFF_PREVIEW_SIZE,
+            TIFF_PREVIEW_SIZE,
+        )
+        trace_rect = QRect(
+            rect.right() - TIFF_PREVIEW_TRACE_WIDTH,
+            rect.top() + 4,
+            TIFF_PREVIEW_TRACE_WIDTH,
+            rect.height() - 8,
+        )
+        text_rect = rect.adjusted(TIFF_PREVIEW_SIZE + 8, 0, -(TIFF_PREVIEW_TRACE_WIDTH + 8), 0)
+
+        if not preview:
+            painter.drawRect(thumb_rect)
+            painter.drawText(trace_rect, Qt.AlignCenter, "..." if preview is None else "no preview")
+            return text_rect
+
+        if preview["thumbnail"] is not None:
+            if "pixmap" not in preview:
+                # Converted once in the GUI thread, then reused for every repaint
+                thumbnail = preview["thumbnail"]
+                height, width = thumbnail.shape
+                image = QImage(thumbnail.data, width, height, width, QImage.Format_Grayscale8).copy()
+                preview["pixmap"] = QPixmap.fromImage(image)
+            pixmap = preview["pixmap"].scaled(thumb_rect.size(), Qt.KeepAspectRatio)
+            painter.drawPixmap(thumb_rect.topLeft(), pixmap)
+
+        # Frame count on top, mean-intensity sparkline below
+        painter.drawText(trace_rect, Qt.AlignTop | Qt.AlignRight, f"{preview['frames']} frames")
+        trace = preview["trace"]
+        if len(trace) > 1:
+            line_rect = trace_rect.adjusted(0, painter.fontMetrics().height() + 2, 0, 0)
+            last_frame = max(trace[-1][0], 1)
+            means = [mean for _, mean in trace]
+            low, span = min(means), (max(means) - min(means)) or 1
+            points = QPolygonF([
+                QPointF(
+                    line_rect.left() + line_rect.width() * frame / last_frame,
+                    line_rect.bottom() - line_rect.height() * (mean - low) / span,
+                )
+                for frame, mean in trace
+            ])
+            painter.drawPolyline(points)
+        return text_rect
+
     def editorEvent(self, event, model, option, index):
         """Handle mouse clicks on the checkbox"""
         # Check if item is checkable
@@ -131,6 +192,8 @@ class DelegateCheckableListItem(QStyledItemDelegate):
         """Ensure item height accommodates the checkbox"""
         # Add 8px to the space around the checkbox for padding
         size = super().sizeHint(option, index)
+        if self.show_previews:
+            return QSize(size.width(), max(size.height(), TIFF_PREVIEW_SIZE + 8))
         return QSize(
             size.width(),
             max(size.height(), 40 + 8),
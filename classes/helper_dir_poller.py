@@ -0,0 +1,93 @@
+## Modules
+# Standard library imports
+import os
+
+# Third-party imports
+from PySide6.QtCore import QObject, QThreadPool, QTimer
+
+# Local application imports
+from classes.helper_scan_task import ScanTask
+from util.constants import DIRWATCHER_POLL_MAX_MS, DIRWATCHER_POLL_MIN_MS
+
+
+class DirPoller(QObject):
+    """Adaptive polling backend of DirScanner, for network shares where QFileSystemWatcher misses remote writes
+
+    Each poll only stats the directories the scanner knows (in the thread pool) and rescans those whose mtime
+    changed, i.e. where a file was created, deleted or renamed. The interval drops to min_ms on any activity and
+    doubles up to max_ms while idle; idle polls at max_ms do a full rescan, which also catches in-place rewrites.
+    """
+
+    def __init__(self, scanner, min_ms=DIRWATCHER_POLL_MIN_MS, max_ms=DIRWATCHER_POLL_MAX_MS):
+        super().__init__(scanner)
+        self.scanner = scanner
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.interval_ms = min_ms
+        self.dir_mtimes = {}  # directory -> mtime of the last poll (None if it was gone)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.poll)
+        self.generation = 0
+        self.poll_task = None
+        self.thread_pool = QThreadPool.globalInstance()
+        self.scanner.fileListChanged.connect(self.speed_up)
+
+    def start(self):
+        self.stop()
+        self.dir_mtimes = {}
+        self.interval_ms = self.min_ms
+        self.timer.start(self.interval_ms)
+
+    def stop(self):
+        self.timer.stop()
+        # A poll still in flight is ignored when it ends
+        self.generation += 1
+
+    def is_active(self):
+        return self.timer.isActive() or self.poll_task is not None
+
+    @staticmethod
+    def stat_directories(directories):
+        """Runs in the thread pool: directory -> mtime (None if it is gone), one stat per directory"""
+        mtimes = {}
+        for directory in directories:
+            try:
+                mtimes[directory] = os.stat(directory).st_mtime
+            except OSError:
+                mtimes[directory] = None
+        return mtimes
+
+    def poll(self):
+        self.generation += 1
+        directories = self.scanner.watched_directories() or [self.scanner.root]
+        self.poll_task = ScanTask(self.generation, self.stat_directories, directories)
+        self.poll_task.signals.finished.connect(self.apply_poll)
+        self.thread_pool.start(self.poll_task)
+
+    def apply_poll(self, generation, mtimes):
+        if generation != self.generation:
+            return
+        self.poll_task = None
+        if isinstance(mtimes, Exception):
+            mtimes = {}
+
+        changed = [directory for directory, mtime in mtimes.items() if self.dir_mtimes.get(directory, -1) != mtime]
+        self.dir_mtimes = mtimes
+
+        if self.interval_ms >= self.max_ms:
+            self.scanner.scan_filetype()
+        elif changed:
+            self.scanner.mark_dirty(changed)
+            self.scanner.scan_changes()
+
+        # Directory activity polls fast again, an idle poll backs off exponentially
+        self.interval_ms = self.min_ms if changed else min(self.interval_ms * 2, self.max_ms)
+        self.timer.start(self.interval_ms)
+
+    def speed_up(self, *_):
+        """Files changed (e.g. found by the idle full rescan): poll at the fastest rate again"""
+        self.interval_ms = self.min_ms
+        if self.timer.isActive():
+            self.timer.start(self.interval_ms)
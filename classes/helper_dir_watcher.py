@@ -1,90 +1,130 @@
 ## Modules
 # Standard library imports
-from pathlib import Path
+import os
 
 # Third-party imports
-from PySide6.QtCore import QFileSystemWatcher, Signal
+from PySide6.QtCore import QObject, Signal
 from rich import print
 
+# Local application imports
+from classes.helper_watch_service import WatchService
+from util.constants import DIRWATCHER_BACKEND, DIRWATCHER_DEBOUNCE_MS, DIRWATCHER_MAX_DIRS
 
-class DirWatcher(QFileSystemWatcher):
-    """A class to watch a directory for specific filetype changes and update a target combobox"""
+
+class DirWatcher(QObject):
+    """A class to watch a directory for specific filetype changes and update a target combobox
+
+    The directory itself is watched by the shared WatchService: watchers of the same folder share one scanner
+    (see DirScanner for the debouncing, recursive mode and backends), each receiving only its own filetype.
+    """
 
     # Signal emitted when combobox is refreshed (backward compatibility)
     filelistRenewed = Signal()
     # Signal emitted with scanned file list (for non-combobox usage)
     fileListScanned = Signal(list)
-
-    def __init__(self, filetype=".rec", target_cb=None):
+    # Signal emitted with the added, removed and modified filenames when a scan differs from the previous one
+    fileListChanged = Signal(list, list, list)
+
+    def __init__(
+        self,
+        filetype=".rec",
+        target_cb=None,
+        debounce_ms=DIRWATCHER_DEBOUNCE_MS,
+        recursive=False,
+        max_dirs=DIRWATCHER_MAX_DIRS,
+        exclude_dirs=(),
+        backend=DIRWATCHER_BACKEND,
+        service=None,
+    ):
         super().__init__()
         self.filetype = filetype
         self.target_cb = target_cb
-        self.directoryChanged.connect(self.scan_filetype)
-
-    def set_watched_dir(self, dir_path):
-        if self.directories():
-            self.removePaths(self.directories())
-
-        self.addPath(dir_path)
-        self.scan_filetype()
+        # Options of the scanner, used when this watcher is the first one of its directory
+        self.debounce_ms = debounce_ms
+        self.recursive = recursive
+        self.max_dirs = max_dirs
+        self.exclude_dirs = set(exclude_dirs)
+        self.backend = backend
+        self.service = service or WatchService.instance()
+        self.scanner = None
+        self.root = None
+        self.combobox_synced = False  # Whether the combobox shows the current directory
+
+    def set_watched_dir(self, dir_path, recursive=None):
+        if recursive is not None:
+            self.recursive = recursive
+        if self.scanner is not None:
+            self.service.unsubscribe(self, self.scanner)
+
+        self.root = os.path.normpath(str(dir_path))
+        self.combobox_synced = False
+        self.scanner = self.service.subscribe(self, self.root)
 
     def scan_filetype(self):
-        """Scan the watched directory for files of the specified filetype and update the target combobox"""
-        if not self.directories():
+        """Rescan the whole watched directory (tree); every subscriber of the directory gets the result"""
+        if self.scanner is None:
             print("[bold red]No directory is being watched by DirWatcher[/bold red]")
             return
+        self.scanner.scan_filetype()
+
+    def watched_directories(self):
+        """Directories known from the last scans: the watched one and, in recursive mode, its sub-directories"""
+        return self.scanner.watched_directories() if self.scanner is not None else []
 
-        watched_dir = Path(self.directories()[0])
-        if watched_dir.exists() is False:
+    def receive(self, added, removed, modified, filtered_filenames, exists):
+        """Called by the scanner with the changes of this watcher's filetype, emit them and update the combobox"""
+        if not exists:
             if self.target_cb is not None:
                 self.target_cb.clear()
                 self.target_cb.addItem("-- Input directory does not exist --")
+                self.combobox_synced = False
             self.fileListScanned.emit([])
+            if removed:
+                self.fileListChanged.emit([], removed, [])
             return
 
-        filtered_filenames = sorted([path.name for path in list(watched_dir.glob(f"*{self.filetype}"))])
-
         # Always emit the scanned file list (for non-combobox usage)
         self.fileListScanned.emit(filtered_filenames)
 
-        # Update combobox only if target_cb is assigned
-        if self.target_cb is None:
-            return
+        # Update combobox only if target_cb is assigned, before the diff so its consumers see the new selection
+        if self.target_cb is not None:
+            if added or removed or not self.combobox_synced:
+                self.update_combobox(filtered_filenames, added)
+                self.combobox_synced = True
+            elif self.target_cb.currentText() in modified:
+                # The selected file was rewritten (e.g. still being saved), let consumers reload it
+                self.filelistRenewed.emit()
+
+        if added or removed or modified:
+            self.fileListChanged.emit(added, removed, modified)
 
-        # Remember current selection and file list before clearing
+    def update_combobox(self, filtered_filenames, added):
+        # Remember current selection before clearing
         current_selection = self.target_cb.currentText()
-        old_files = set(
-            self.target_cb.itemText(i)
-            for i in range(self.target_cb.count())
-            if not self.target_cb.itemText(i).startswith("--")
-        )
 
         # clear target combobox
         self.target_cb.clear()
 
         if not filtered_filenames:
             self.target_cb.addItem(f"-- No {self.filetype.replace('.', '').upper()}s in current dir --")
-        else:
-            self.target_cb.addItems(filtered_filenames)
+            return
 
-            # Check for new files
-            new_files = set(filtered_filenames) - old_files
+        self.target_cb.addItems(filtered_filenames)
 
-            if new_files:
-                # Select the newest added file (last one alphabetically among new files)
-                newest_file = sorted(new_files)[-1]
-                index = self.target_cb.findText(newest_file)
+        if added:
+            # Select the newest added file (last one alphabetically among new files)
+            index = self.target_cb.findText(added[-1])
+            self.target_cb.setCurrentIndex(index)
+        elif current_selection and not current_selection.startswith("--"):
+            # Restore previous selection if it still exists
+            index = self.target_cb.findText(current_selection)
+            if index >= 0:
                 self.target_cb.setCurrentIndex(index)
-            elif current_selection and not current_selection.startswith("--"):
-                # Restore previous selection if it still exists
-                index = self.target_cb.findText(current_selection)
-                if index >= 0:
-                    self.target_cb.setCurrentIndex(index)
-                else:
-                    self.target_cb.setCurrentIndex(len(filtered_filenames) - 1)
             else:
-                # Default to last file
                 self.target_cb.setCurrentIndex(len(filtered_filenames) - 1)
+        else:
+            # Default to last file
+            self.target_cb.setCurrentIndex(len(filtered_filenames) - 1)
 
-            # Emit signal indicating combobox has been refreshed
-            self.filelistRenewed.emit()
+        # Emit signal indicating combobox has been refreshed
+        self.filelistRenewed.emit()
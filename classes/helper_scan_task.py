@@ -0,0 +1,33 @@
+## Modules
+# Third-party imports
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+
+class ScanTaskSignals(QObject):
+    """QRunnable cannot emit signals itself; emitted from the pool thread, they reach the GUI thread queued"""
+
+    finished = Signal(int, object)  # generation of the request, result of the scan function
+
+
+class ScanTask(QRunnable):
+    """Run a file-system scan function in a QThreadPool and send its result back with the request generation
+
+    Callers bump a generation counter for every request and ignore results that are not the latest one,
+    so a newer scan always supersedes a stale one still in flight.
+    """
+
+    def __init__(self, generation, function, *args):
+        super().__init__()
+        self.generation = generation
+        self.function = function
+        self.args = args
+        self.signals = ScanTaskSignals()
+        # The caller keeps the task (to take it back from the queue when superseded), so Qt must not delete it
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            result = self.function(*self.args)
+        except Exception as e:
+            result = e
+        self.signals.finished.emit(self.generation, result)
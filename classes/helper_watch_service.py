@@ -0,0 +1,330 @@
+## Modules
+# Standard library imports
+import os
+from time import monotonic
+
+# Third-party imports
+from PySide6.QtCore import QFileSystemWatcher, QObject, QThreadPool, QTimer, Signal
+from rich import print
+
+# Local application imports
+from classes.helper_dir_poller import DirPoller
+from classes.helper_scan_task import ScanTask
+from functions.system_resources import is_network_path
+from util.constants import DIRWATCHER_MAX_DELAY_MS
+
+
+def matches_filetype(name, filetype):
+    """Case-insensitive extension match, as the former Path.glob on Windows (X.REC is a .rec file)"""
+    return name.lower().endswith(filetype.lower())
+
+
+class DirScanner(QFileSystemWatcher):
+    """Watch one directory (tree) for all the filetypes its subscribers (DirWatcher) ask for
+
+    Bursts of directory events (e.g. a camera writing fragments) are coalesced into one rescan, which is compared
+    with the snapshot of the previous scan so subscribers only receive what was added, removed or modified.
+    The listing itself runs in a thread pool, so slow (network) directories never block the GUI.
+
+    In recursive mode the whole subtree is registered (up to max_dirs directories) and new sub-directories are
+    followed as they appear. Each directory keeps its own snapshot, so an event only rescans the directory it
+    came from. Filenames of sub-directories are reported relative to the watched directory (sub/name.tif).
+
+    backend picks how changes are noticed: "native" file system events, "polling" (DirPoller, for SMB/NFS
+    shares where events of remote writers never arrive), or "auto", which polls only on network shares.
+    """
+
+    # Signal emitted with the added, removed and modified filenames (all filetypes) when a scan found changes
+    fileListChanged = Signal(list, list, list)
+
+    def __init__(self, root, recursive, exclude_dirs, debounce_ms, max_dirs, backend):
+        super().__init__()
+        self.root = root
+        self.recursive = recursive
+        self.exclude_dirs = set(exclude_dirs)  # Sub-directory names never entered (e.g. merged outputs)
+        self.debounce_ms = debounce_ms
+        self.max_dirs = max_dirs
+        self.backend = backend
+        self.subscribers = []
+        self.filetypes = set()  # Filetypes listed for the subscribers, lowercase
+        self.snapshots = {}  # directory -> {filename: (size, mtime)} of the last scan
+        self.scanned = False  # Whether a scan has completed, so new subscribers can be served from the snapshots
+        self.started = False
+        self.limit_warned = False
+        self.polling = False
+        self.poller = DirPoller(self)
+
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setSingleShot(True)
+        self.scan_timer.timeout.connect(self.scan_changes)
+        self.burst_started = 0.0
+        self.dirty_dirs = set()  # Directories with events since the last scan request
+        self.directoryChanged.connect(self.directory_changed)
+
+        # Each scan request gets a new generation, results of older ones are dropped
+        self.scan_generation = 0
+        self.pending_scan = None
+        # Directories (or the whole tree) of the request in flight, requested again if it is superseded
+        self.in_flight_dirs = set()
+        self.full_in_flight = False
+        self.thread_pool = QThreadPool.globalInstance()
+
+    def start(self):
+        self.started = True
+        self.polling = self.backend == "polling" or (self.backend == "auto" and is_network_path(self.root))
+        if self.polling:
+            print(f"[cyan]Watch service: polling {self.root}[/cyan]")
+            self.poller.start()
+        else:
+            self.addPath(self.root)
+        self.scan_filetype()
+
+    def close(self):
+        self.poller.stop()
+        self.scan_timer.stop()
+        if self.directories():
+            self.removePaths(self.directories())
+        # A scan still in flight is ignored when it ends
+        self.scan_generation += 1
+
+    def add_subscriber(self, watcher):
+        self.subscribers.append(watcher)
+        if watcher.filetype.lower() not in self.filetypes:
+            # A new filetype is not in the snapshots yet, list it (the others see no change)
+            self.filetypes.add(watcher.filetype.lower())
+            if self.started:
+                self.scan_filetype()
+        elif self.scanned:
+            # Same filetype as another subscriber: served from the snapshots, no file-system access
+            self.fan_out(self.files_of(watcher.filetype), [], [], [watcher])
+
+    def remove_subscriber(self, watcher):
+        if watcher in self.subscribers:
+            self.subscribers.remove(watcher)
+
+    def watched_directories(self):
+        """Directories known from the last scans: the watched one and, in recursive mode, its sub-directories"""
+        return sorted(self.snapshots)
+
+    def directory_changed(self, path):
+        self.dirty_dirs.add(os.path.normpath(path))
+        self.schedule_scan()
+
+    def mark_dirty(self, directories):
+        """Directories to rescan with the next scan_changes (e.g. found changed by the poller)"""
+        self.dirty_dirs.update(directories)
+
+    def schedule_scan(self):
+        """Restart the quiet-time timer on each event, but never postpone the scan past the max delay of the burst"""
+        now = monotonic()
+        if not self.scan_timer.isActive():
+            self.burst_started = now
+        remaining_ms = DIRWATCHER_MAX_DELAY_MS - (now - self.burst_started) * 1000
+        self.scan_timer.start(int(max(0, min(self.debounce_ms, remaining_ms))))
+
+    @staticmethod
+    def list_tree(directories, filetypes, recursive, walk, known, exclude_dirs):
+        """directory -> ({filename: (size, mtime)}, [sub-directories]) from os.scandir, None if it is gone
+
+        Runs in the thread pool. DirEntry caches its stat (free on Windows, where scandir already returns it).
+        Filetypes are lowercase and match case-insensitively (Z.TIF is a .tif), like a glob on Windows.
+        Sub-directories are listed as well when walking the tree, or when they are not known yet.
+        """
+        listings = {}
+        pending = list(directories)
+        while pending:
+            directory = pending.pop()
+            if directory in listings:
+                continue
+            files, subdirs = {}, []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and entry.name not in exclude_dirs:
+                                subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(filetypes) and entry.is_file():
+                            stat = entry.stat()
+                            files[entry.name] = (stat.st_size, stat.st_mtime)
+            except OSError:
+                listings[directory] = None
+                continue
+            listings[directory] = (files, sorted(subdirs))
+            pending.extend(subdir for subdir in subdirs if walk or subdir not in known)
+        return listings
+
+    def scan_filetype(self):
+        """Rescan the whole watched directory (tree) in the thread pool"""
+        self.start_scan(full=True)
+
+    def scan_changes(self):
+        """Rescan only the directories that reported events"""
+        self.start_scan(full=False)
+
+    def start_scan(self, full):
+        """Start a scan in the thread pool, superseding any scan still in flight"""
+        self.scan_timer.stop()
+        # A stale scan that has not started yet is dropped from the queue, a running one is ignored when it ends
+        if self.pending_scan is not None:
+            self.thread_pool.tryTake(self.pending_scan)
+        self.full_in_flight |= full
+        self.in_flight_dirs |= self.dirty_dirs
+        self.dirty_dirs = set()
+        self.scan_generation += 1
+        self.pending_scan = ScanTask(
+            self.scan_generation,
+            self.list_tree,
+            [self.root] if self.full_in_flight else sorted(self.in_flight_dirs),
+            tuple(sorted(self.filetypes)),
+            self.recursive,
+            self.full_in_flight,
+            set(self.snapshots),
+            self.exclude_dirs,
+        )
+        self.pending_scan.signals.finished.connect(self.apply_scan)
+        self.thread_pool.start(self.pending_scan)
+
+    def relative_name(self, directory, filename):
+        if directory == self.root:
+            return filename
+        return os.path.join(os.path.relpath(directory, self.root), filename)
+
+    def apply_scan(self, generation, listings):
+        """Compare a finished scan with the snapshots and send the diff to the subscribers"""
+        if generation != self.scan_generation:
+            return
+        self.pending_scan = None
+        full = self.full_in_flight
+        self.full_in_flight = False
+        self.in_flight_dirs = set()
+        if isinstance(listings, Exception):
+            print(f"[bold red]Watch service scan of {self.root} failed: {listings}[/bold red]")
+            return
+
+        # Directories that vanished: unlisted ones, sub-directories missing from their parent, and everything below
+        gone = {directory for directory, listing in listings.items() if listing is None}
+        if full:
+            gone |= {directory for directory in self.snapshots if directory not in listings}
+        for directory, listing in listings.items():
+            if listing is not None:
+                subdirs = set(listing[1])
+                gone |= {
+                    known for known in self.snapshots if os.path.dirname(known) == directory and known not in subdirs
+                }
+        gone = {
+            known
+            for known in self.snapshots
+            if any(known == directory or known.startswith(directory + os.sep) for directory in gone)
+        }
+
+        added, removed, modified = [], [], []
+        for directory in gone:
+            removed.extend(self.relative_name(directory, name) for name in self.snapshots.pop(directory))
+        for directory, listing in listings.items():
+            if listing is None or directory in gone:
+                continue
+            current = listing[0]
+            snapshot = self.snapshots.get(directory, {})
+            added.extend(self.relative_name(directory, name) for name in current if name not in snapshot)
+            removed.extend(self.relative_name(directory, name) for name in snapshot if name not in current)
+            modified.extend(
+                self.relative_name(directory, name)
+                for name in current
+                if name in snapshot and current[name] != snapshot[name]
+            )
+            self.snapshots[directory] = current
+        added, removed, modified = sorted(added), sorted(removed), sorted(modified)
+        self.update_watched_paths(gone)
+
+        if added or removed or modified:
+            self.fileListChanged.emit(added, removed, modified)
+        self.scanned = True
+        self.fan_out(added, removed, modified)
+
+    def files_of(self, filetype):
+        return sorted(
+            self.relative_name(directory, name)
+            for directory, files in self.snapshots.items()
+            for name in files
+            if matches_filetype(name, filetype)
+        )
+
+    def fan_out(self, added, removed, modified, subscribers=None):
+        """Pass each subscriber the part of the diff (and of the file list) of its filetype"""
+        exists = self.root in self.snapshots
+        for watcher in subscribers or self.subscribers:
+            filetype = watcher.filetype
+            watcher.receive(
+                [name for name in added if matches_filetype(name, filetype)],
+                [name for name in removed if matches_filetype(name, filetype)],
+                [name for name in modified if matches_filetype(name, filetype)],
+                self.files_of(filetype),
+                exists,
+            )
+
+    def update_watched_paths(self, gone):
+        """Stop watching vanished directories and register new ones, up to max_dirs"""
+        if self.polling:
+            return
+        watched = set(os.path.normpath(path) for path in self.directories())
+        stale = [path for path in self.directories() if os.path.normpath(path) in gone]
+        if stale:
+            self.removePaths(stale)
+            watched -= gone
+
+        new_dirs = sorted(directory for directory in self.snapshots if directory not in watched)
+        room = self.max_dirs - len(watched)
+        if len(new_dirs) > room and not self.limit_warned:
+            self.limit_warned = True
+            print(
+                f"[yellow]Watch service: {len(watched) + len(new_dirs)} directories under {self.root}, "
+                f"only {self.max_dirs} are watched (the others refresh with full rescans)[/yellow]"
+            )
+        if new_dirs[: max(room, 0)]:
+            self.addPaths(new_dirs[: max(room, 0)])
+
+
+class WatchService(QObject):
+    """One DirScanner per watched directory, shared by every DirWatcher that subscribes to it
+
+    Controllers usually watch the same folder for different filetypes (.rec, .abf, .tif): one scan per change
+    then fans out to all of them instead of each tab listing the folder on its own.
+    """
+
+    _instance = None
+
+    def __init__(self):
+        super().__init__()
+        self.scanners = {}  # (root, recursive, excluded sub-directories) -> DirScanner
+
+    @classmethod
+    def instance(cls):
+        """The service shared by the whole application"""
+        if cls._instance is None:
+            cls._instance = WatchService()
+        return cls._instance
+
+    def subscribe(self, watcher, root):
+        """Attach a DirWatcher to the scanner of root (created on first use) and return the scanner"""
+        exclude_dirs = frozenset(watcher.exclude_dirs) if watcher.recursive else frozenset()
+        key = (root, watcher.recursive, exclude_dirs)
+        scanner = self.scanners.get(key)
+        if scanner is None:
+            scanner = DirScanner(
+                root, watcher.recursive, exclude_dirs, watcher.debounce_ms, watcher.max_dirs, watcher.backend
+            )
+            self.scanners[key] = scanner
+            scanner.add_subscriber(watcher)
+            scanner.start()
+        else:
+            scanner.add_subscriber(watcher)
+        return scanner
+
+    def unsubscribe(self, watcher, scanner):
+        """Detach a DirWatcher, the scanner stops once nobody subscribes to it"""
+        scanner.remove_subscriber(watcher)
+        if scanner.subscribers:
+            return
+        scanner.close()
+        self.scanners = {key: other for key, other in self.scanners.items() if other is not scanner}
+        scanner.deleteLater()
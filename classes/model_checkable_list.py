@@ -1,23 +1,44 @@
 ## Modules
-from PySide6.QtCore import Qt, QAbstractListModel, Signal
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, Signal
 
 class ModelCheckableList(QAbstractListModel):
     """Create a checkable list model for QListView file browser"""
     
     # Add a custom signal to check if all items are selected in setData
     allSelectedCheck = Signal(bool)
+    # Emitted once per item when a view first asks for its preview (i.e. when the row is painted)
+    previewNeeded = Signal(str)
+
+    # Role of the item preview (see functions/tiff_preview.py), None until set_preview is called
+    PreviewRole = Qt.UserRole + 1
     
     def __init__(self, list_of_files=None, name=None):
         super().__init__()
         self.list_of_files = list_of_files or []
         self.name = name
         self.checked_states = [True] * len(self.list_of_files)
+        self.previews = {}  # item -> preview
+        self.preview_requested = set()
         
     def data(self, index, role):
         if role == Qt.DisplayRole:
             return self.list_of_files[index.row()]
         elif role == Qt.CheckStateRole:
             return Qt.Checked if self.checked_states[index.row()] else Qt.Unchecked
+        elif role == self.PreviewRole:
+            item = self.list_of_files[index.row()]
+            if item not in self.previews and item not in self.preview_requested:
+                self.preview_requested.add(item)
+                self.previewNeeded.emit(item)
+            return self.previews.get(item)
+        elif role == Qt.ToolTipRole:
+            preview = self.previews.get(self.list_of_files[index.row()])
+            if preview:
+                means = [mean for _, mean in preview["trace"]] or [0]
+                return (
+                    f"{preview['frames']} frames in {preview['fragments']} fragment(s), "
+                    f"mean intensity {min(means):.1f} - {max(means):.1f}"
+                )
         
     def rowCount(self, index):
         return len(self.list_of_files)
@@ -45,6 +66,39 @@ class ModelCheckableList(QAbstractListModel):
             self.checked_states = [False] * len(file_list)
         self.endResetModel()
         
+    def sync_tiff_list(self, file_list, check_new=False):
+        """Remove and insert only the rows that differ from file_list, keeping the check states of the others"""
+        new_files = set(file_list)
+        for row in reversed(range(len(self.list_of_files))):
+            if self.list_of_files[row] not in new_files:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.list_of_files[row]
+                del self.checked_states[row]
+                self.endRemoveRows()
+
+        for row, item in enumerate(file_list):
+            if row < len(self.list_of_files) and self.list_of_files[row] == item:
+                continue
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.list_of_files.insert(row, item)
+            self.checked_states.insert(row, check_new)
+            self.endInsertRows()
+
+    def set_preview(self, item, preview):
+        """Store the preview of an item (empty if it could not be made) and repaint its row"""
+        self.previews[item] = preview
+        if item in self.list_of_files:
+            index = self.index(self.list_of_files.index(item))
+            self.dataChanged.emit(index, index, [self.PreviewRole, Qt.ToolTipRole])
+
+    def invalidate_preview(self, item):
+        """Forget the preview of an item (e.g. its files changed), it is requested again when next painted"""
+        self.previews.pop(item, None)
+        self.preview_requested.discard(item)
+        if item in self.list_of_files:
+            index = self.index(self.list_of_files.index(item))
+            self.dataChanged.emit(index, index, [self.PreviewRole, Qt.ToolTipRole])
+
     def get_checked(self):
         """Return a list of checked items"""
         return [item for item, checked in zip(self.list_of_files, self.checked_states) if checked]
@@ -0,0 +1,78 @@
+## Modules
+# Third-party imports
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtGui import QColor
+
+JOB_HEADERS = ("File", "State", "Progress")
+JOB_STATE_COLORS = {
+    "queued": "gray",
+    "running": "deepskyblue",
+    "done": "lime",
+    "failed": "red",
+    "cancelled": "yellow",
+}
+
+
+class ModelStackerJobs(QAbstractTableModel):
+    """Table model of the TIFF stacker job queue: state and fragment progress of every file in the batch"""
+
+    def __init__(self):
+        super().__init__()
+        self.jobs = []  # [file, display name, state, fragments done, fragments total]
+        self.rows = {}  # file -> row
+
+    def data(self, index, role=Qt.DisplayRole):
+        file, display_name, state, done, total = self.jobs[index.row()]
+        if role == Qt.DisplayRole:
+            if index.column() == 0:
+                return display_name
+            if index.column() == 1:
+                return state
+            if total:
+                return f"{done}/{total} ({done / total * 100:.0f}%)"
+            return ""
+        if role == Qt.ForegroundRole and index.column() == 1:
+            return QColor(JOB_STATE_COLORS.get(state, "white"))
+        if role == Qt.ToolTipRole:
+            return file
+
+    def rowCount(self, index=None):
+        return len(self.jobs)
+
+    def columnCount(self, index=None):
+        return len(JOB_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return JOB_HEADERS[section]
+
+    def add_jobs(self, display_names_by_file):
+        """Append the files not listed yet (files already listed keep their row)"""
+        new_files = [file for file in display_names_by_file if file not in self.rows]
+        if not new_files:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.jobs), len(self.jobs) + len(new_files) - 1)
+        for file in new_files:
+            self.rows[file] = len(self.jobs)
+            self.jobs.append([file, display_names_by_file[file], "queued", 0, 0])
+        self.endInsertRows()
+
+    def set_state(self, file, state):
+        if file not in self.rows:
+            return
+        row = self.rows[file]
+        self.jobs[row][2] = state
+        self.dataChanged.emit(self.index(row, 1), self.index(row, 2))
+
+    def set_progress(self, file, done, total):
+        if file not in self.rows:
+            return
+        row = self.rows[file]
+        self.jobs[row][3:5] = [done, total]
+        self.dataChanged.emit(self.index(row, 2), self.index(row, 2))
+
+    def clear(self):
+        self.beginResetModel()
+        self.jobs = []
+        self.rows = {}
+        self.endResetModel()
@@ -0,0 +1,52 @@
+## Modules
+# Standard library imports
+import queue
+import threading
+from pathlib import Path
+
+# Third-party imports
+from PySide6.QtCore import QThread, Signal
+
+# Local application imports
+from functions.live_stacking import discard_live_stack, update_live_stack
+
+
+class ThreadLiveStacker(QThread):
+    """Thread to stack recordings while they are acquired, one landed fragment set at a time."""
+
+    progress_update = Signal(str, str)  # message, color
+    recording_stacked = Signal(str)  # recording whose live stack was finished
+    recording_failed = Signal(str)  # recording whose fragments could not be stacked or finished
+
+    def __init__(self):
+        super().__init__()
+        # (recording, landed fragment paths, complete) from LiveRecordingTracker.update, no paths to discard
+        self.updates = queue.Queue()
+        self.stop_event = threading.Event()
+
+    def submit(self, recording, fragments, complete):
+        self.updates.put((recording, fragments, complete))
+
+    def discard(self, recording):
+        """Remove the live stack of a recording that is given up, after the updates already submitted"""
+        self.updates.put((recording, None, False))
+
+    def stop(self):
+        """Stop after the current fragment set, unfinished live stacks continue the next time"""
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                recording, fragments, complete = self.updates.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if fragments is None:
+                discard_live_stack(recording)
+                continue
+            try:
+                if update_live_stack(recording, fragments, complete, report=self.progress_update.emit):
+                    self.recording_stacked.emit(recording)
+            except Exception as e:
+                self.progress_update.emit(f"Error stacking {Path(recording).stem} live: {e}", "red")
+                self.recording_failed.emit(recording)
@@ -0,0 +1,84 @@
+## Modules
+# Standard library imports
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+# Third-party imports
+from PySide6.QtCore import QThread, Signal
+
+# Local application imports
+from functions.rec_db import content_hash, stat_rec_file
+from functions.rec_summary import SummaryBuilder, parse_rec_bytes
+from util.constants import REC_IMPORT_VERIFY_HASH, REC_IMPORT_WORKERS
+
+
+class ThreadRecImport(QThread):
+    """Thread to read .rec files with a bounded pool of readers and build their summary, off the GUI thread.
+
+    With known_states (rec name -> (size, mtime, hash) of the previous import), the import is incremental: files
+    whose size and mtime are unchanged are only stat-ed, and only new or modified files are parsed. verify_hash
+    also reads the unchanged files and parses the ones whose content hash differs (edits that kept the mtime).
+    """
+
+    progress_update = Signal(str, str)  # message, color
+    # summary DataFrame of the parsed files (None if none), rec name -> (size, mtime, hash), removed rec names
+    import_finished = Signal(object, dict, list)
+
+    def __init__(
+        self,
+        list_of_rec_paths,
+        known_states=None,
+        verify_hash=REC_IMPORT_VERIFY_HASH,
+        max_workers=REC_IMPORT_WORKERS,
+    ):
+        super().__init__()
+        self.list_of_rec_paths = list_of_rec_paths
+        self.known_states = known_states
+        self.verify_hash = verify_hash
+        self.max_workers = max_workers
+
+    def inspect(self, rec_path):
+        """Runs in the pool: state of the file and its parsed record, None when it did not change"""
+        size, mtime = stat_rec_file(rec_path)
+        known = (self.known_states or {}).get(Path(rec_path).name)
+        if known is not None and known[:2] == (size, mtime) and not self.verify_hash:
+            return known, None
+
+        with open(rec_path, mode="rb") as f:
+            raw = f.read()
+        digest = content_hash(raw) if self.verify_hash else None
+        if known is not None and digest is not None and known[2] == digest:
+            return (size, mtime, digest), None
+        return (size, mtime, digest), parse_rec_bytes(rec_path, raw)
+
+    def run(self):
+        total = len(self.list_of_rec_paths)
+        records = [None] * total
+        states = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.inspect, rec_path): i for i, rec_path in enumerate(self.list_of_rec_paths)}
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                rec_name = Path(self.list_of_rec_paths[i]).name
+                try:
+                    states[rec_name], records[i] = future.result()
+                except Exception as e:
+                    self.progress_update.emit(f"[ERROR] [{done}/{total}] Failed to read {rec_name}: {e}", "tomato")
+                    continue
+                if records[i] is not None:
+                    self.progress_update.emit(f"[INFO] [{done}/{total}] {rec_name} scanned", "white")
+
+        unchanged = len(states) - sum(record is not None for record in records)
+        if self.known_states is not None and unchanged:
+            self.progress_update.emit(f"[INFO] {unchanged} unchanged .rec file(s) skipped", "white")
+
+        # Files imported before that are gone now
+        seen = {Path(rec_path).name for rec_path in self.list_of_rec_paths}
+        removed = sorted(set(self.known_states or {}) - seen)
+
+        # Rows in file order, whatever order the reads finished in
+        builder = SummaryBuilder()
+        for record in records:
+            if record is not None:
+                builder.add(*record)
+        self.import_finished.emit(builder.to_frame() if builder.n_rows else None, states, removed)
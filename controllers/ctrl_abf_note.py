@@ -49,8 +49,9 @@ class CtrlAbfNote:
 
         self.ui.tabs.currentChanged.connect(self.check_watching_dir)
 
-        # the last step of watcher is set the current index to the last one, therefore this signal should use currentIndexChanged
-        self.abf_watcher.filelistRenewed.connect(self.new_abf_detected)
+        # the watcher selects the newest added file before emitting the diff, so only an added or rewritten
+        # current file is read again (removing other files no longer re-queries the database)
+        self.abf_watcher.fileListChanged.connect(self.abf_files_changed)
 
         # Allow manual selection of ABF files to go back and log missed files
         self.ui.cb_currentAbf.activated.connect(self.on_abf_manually_selected)
@@ -240,6 +241,10 @@ class CtrlAbfNote:
             return
         self.read_abf_info(current_abf)
 
+    def abf_files_changed(self, added, removed, modified):
+        if self.ui.cb_currentAbf.currentText() in added + modified:
+            self.new_abf_detected()
+
     def new_abf_detected(self):
         current_abf = self.ui.cb_currentAbf.currentText()
         if current_abf.startswith("--"):
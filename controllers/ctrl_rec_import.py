@@ -9,13 +9,23 @@ from pathlib import Path
 import pandas as pd
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QTextCursor
-from PySide6.QtSql import QSqlDatabase, QSqlTableModel
+from PySide6.QtSql import QSqlDatabase, QSqlQuery, QSqlQueryModel, QSqlTableModel
 from rich import print
 from tabulate import tabulate
 
 # Local application imports
-from classes import DialogConfirm, DialogGetPath, ModelDynamicList
-from functions.rec_encoding_checker import rec_encoding_checker
+from classes import DialogConfirm, DialogGetPath, ModelDynamicList, ThreadRecImport
+from functions.rec_db import (
+    delete_session,
+    drop_states,
+    is_sidecar_table,
+    load_states,
+    migrate_folder_tables,
+    save_states,
+    sync_session,
+    upsert_summary,
+)
+from functions.rec_query import compile_query, parse_tag_filters
 from util.constants import MODELS_DIR
 
 
@@ -24,12 +34,16 @@ class CtrlRecImport:
         self.ui = ui
 
         self.setup_db()
+        self.import_thread = None
+        self.import_dir = None
+        self.import_incremental = False
 
         self.model_tablesOfRecDB = ModelDynamicList(name="model_tablesOfRecDB")
         self.ui.cb_recDbTable.setModel(self.model_tablesOfRecDB)
 
         self.connect_signals()
         self.refresh_rec_table_list()
+        self.migrate_rec_db()
         self.ui.cb_recDbTable.setCurrentIndex(self.model_tablesOfRecDB.rowCount() - 1)
         self.load_rec_table()
 
@@ -41,6 +55,8 @@ class CtrlRecImport:
         self.model_recDB = QSqlTableModel(db=self.db)
         self.ui.tv_recDb.setModel(self.model_recDB)
         self.sm_recDB = self.ui.tv_recDb.selectionModel()
+        # Results of the query bar, fetched from the database in chunks as the view scrolls
+        self.model_recQuery = QSqlQueryModel()
 
     def refresh_rec_table_list(self):
         # 1. Fetch table names from database
@@ -49,63 +65,45 @@ class CtrlRecImport:
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
         fetched = cursor.fetchall()
         conn.close()
-        self.list_of_recDB_tables = sorted([item[0] for item in fetched])
+        # Sidecar tables (import bookkeeping) are not folders
+        self.list_of_recDB_tables = sorted([item[0] for item in fetched if not is_sidecar_table(item[0])])
 
         # 2. Refresh combobox model
         self.model_tablesOfRecDB.update_list(self.list_of_recDB_tables)
         self.model_tablesOfRecDB.layoutChanged.emit()
 
+    def migrate_rec_db(self):
+        """Import the REC_<folder> tables into the normalized tables (rec_recordings, rec_tags) the first time"""
+        conn = sqlite3.connect(str((MODELS_DIR / "rec_data.db").resolve()))
+        with conn:
+            migrated = migrate_folder_tables(conn, self.list_of_recDB_tables)
+        conn.close()
+        if migrated:
+            self.ui.tb_recDb.append(
+                f"<span style='color: lime;'>[INFO] {len(self.list_of_recDB_tables)} table(s) migrated to the "
+                "normalized recordings table</span>"
+            )
+            self.ui.tb_recDb.moveCursor(QTextCursor.End)
+            print(f"[green]{len(self.list_of_recDB_tables)} REC table(s) migrated to the normalized layout[/green]")
+
     def connect_signals(self):
         self.ui.btn_importRecDb.clicked.connect(self.import_rec_db)
         self.ui.cb_recDbTable.activated.connect(self.load_rec_table)
         self.ui.btn_deleteTable.clicked.connect(self.delete_table)
         self.ui.btn_exportSummary.clicked.connect(self.export_summary)
-
-    def rec_content_scanner(self, list_of_rec_paths):
-        list_of_metadata = []
-        list_of_original_content = []
-        rec_filenames = []
-        timestamps = []
-
-        for rec_path in list_of_rec_paths:
-            rec_filenames.append(Path(rec_path).stem)
-            with open(rec_path, mode="r", encoding=rec_encoding_checker(rec_path)) as f:
-                original_content = f.read().splitlines()
-            list_of_original_content.append(original_content)
-
-            for line_num, line_content in enumerate(original_content):
-                if "Time" in line_content:
-                    timestamps.append(line_content.split(" ")[-1])
-
-                if "Comment:" in line_content:
-                    extract_metadata_from = line_num + 2
-                    break
-
-            list_of_metadata.append(original_content[extract_metadata_from:])
-
-        return list_of_metadata, rec_filenames, timestamps
-
-    def convert_pairs_to_dict(self, list_of_pairs):
-        dict_of_pairs = {}
-        for item in list_of_pairs:
-            # split at first ":"
-            key, value = item.split(":", 1)
-            dict_of_pairs[key.strip()] = value.strip()
-        return dict_of_pairs
-
-    def generate_metadata_summary(self, list_of_metadata, rec_filenames, timestamps):
-        result_of_scanning = pd.DataFrame()
-        for pairs_of_metadata in list_of_metadata:
-            dict_metadata = self.convert_pairs_to_dict(pairs_of_metadata)
-            result_of_scanning = pd.concat([result_of_scanning, pd.DataFrame([dict_metadata])]).reset_index(drop=True)
-
-        result_of_scanning.insert(0, "Filename", rec_filenames)
-        result_of_scanning.insert(1, "Timestamp", timestamps)
-        result_of_scanning.replace("None", "", inplace=True)
-        print(tabulate(result_of_scanning, headers="keys", tablefmt="pretty"))
-        return result_of_scanning
+        self.ui.btn_recDbQuery.clicked.connect(self.query_recordings)
+        self.ui.le_recDbTags.returnPressed.connect(self.query_recordings)
+        self.ui.le_recDbFilename.returnPressed.connect(self.query_recordings)
+        self.ui.chk_recDbDateRange.toggled.connect(self.ui.de_recDbFrom.setEnabled)
+        self.ui.chk_recDbDateRange.toggled.connect(self.ui.de_recDbTo.setEnabled)
+        self.ui.btn_recDbShowTable.clicked.connect(self.load_rec_table)
 
     def import_rec_db(self):
+        if self.import_thread is not None:
+            self.ui.tb_recDb.append("<span style='color: yellow;'>[Warning] An import is already running</span>")
+            self.ui.tb_recDb.moveCursor(QTextCursor.End)
+            return
+
         dlg_get_inputDir = DialogGetPath(title="Please select the folder contains .rec files")
         input_dir = dlg_get_inputDir.get_path()
         if input_dir == "":
@@ -119,9 +117,10 @@ class CtrlRecImport:
         # Check if the directory contains .rec files
         list_of_rec_paths = sorted(glob.glob(input_dir + "/*.rec"))
         if list_of_rec_paths == []:
-            self.ui.textBroser_recDB.append(
+            self.ui.tb_recDb.append(
                 "<span style='color: tomato;'>[ERROR] No .rec files are found in the selected directory</span>"
             )
+            self.ui.tb_recDb.moveCursor(QTextCursor.End)
             print("[red]No .rec files found in selected directory[/red]")
             return
         else:
@@ -129,8 +128,47 @@ class CtrlRecImport:
             self.ui.tb_recDb.moveCursor(QTextCursor.End)
             print(f"[cyan]Found {len(list_of_rec_paths)} .rec files, scanning...[/cyan]")
 
-        list_of_metadata, rec_filenames, timestamps = self.rec_content_scanner(list_of_rec_paths)
-        df_summary = self.generate_metadata_summary(list_of_metadata, rec_filenames, timestamps)
+        # Incremental mode re-reads only the files added or modified since the table was last imported
+        # (a table imported before file states were recorded is imported in full once)
+        known_states = None
+        table_name_to_be_written = "REC_" + Path(input_dir).name
+        if self.ui.chk_recDbIncremental.isChecked() and table_name_to_be_written in self.list_of_recDB_tables:
+            conn = sqlite3.connect(str((MODELS_DIR / "rec_data.db").resolve()))
+            with conn:
+                known_states = load_states(conn, table_name_to_be_written) or None
+            conn.close()
+
+        # Files are read concurrently in the background, the summary is saved when all are done
+        self.import_dir = input_dir
+        self.import_incremental = known_states is not None
+        self.import_thread = ThreadRecImport(list_of_rec_paths, known_states)
+        self.import_thread.progress_update.connect(self.update_import_progress)
+        self.import_thread.import_finished.connect(self.save_summary)
+        self.import_thread.finished.connect(self.on_import_finished)
+        self.ui.btn_importRecDb.setEnabled(False)
+        self.import_thread.start()
+
+    def update_import_progress(self, message, color):
+        self.ui.tb_recDb.append(f"<span style='color: {color};'>{message}</span>")
+        self.ui.tb_recDb.moveCursor(QTextCursor.End)
+
+    def on_import_finished(self):
+        self.import_thread = None
+        self.ui.btn_importRecDb.setEnabled(True)
+
+    def save_summary(self, df_summary, states, removed):
+        input_dir = self.import_dir
+        if self.import_incremental:
+            self.save_incremental_summary(df_summary, states, removed)
+            return
+
+        if df_summary is None:
+            self.ui.tb_recDb.append("<span style='color: tomato;'>[ERROR] None of the .rec files could be read</span>")
+            self.ui.tb_recDb.moveCursor(QTextCursor.End)
+            print("[red]None of the .rec files could be read[/red]")
+            return
+
+        print(tabulate(df_summary, headers="keys", tablefmt="pretty"))
         self.ui.tb_recDb.append("<span style='color: lime;'>[INFO] Scanning completed! Summary generated!</span>")
         self.ui.tb_recDb.moveCursor(QTextCursor.End)
 
@@ -140,6 +178,9 @@ class CtrlRecImport:
         table_name_to_be_written = "REC_" + Path(input_dir).name
         if table_name_to_be_written not in self.list_of_recDB_tables:
             df_summary.to_sql(table_name_to_be_written, conn, index=False)
+            save_states(conn, table_name_to_be_written, states, replace=True)
+            sync_session(conn, table_name_to_be_written)
+            conn.commit()
             self.ui.tb_recDb.append(
                 f"<span style='color: lime;'>[INFO] New table '{table_name_to_be_written}' created in database!</span>"
             )
@@ -157,6 +198,9 @@ class CtrlRecImport:
         self.ui.tb_recDb.moveCursor(QTextCursor.End)
         print(f"[yellow]Table '{table_name_to_be_written}' already exists, replacing...[/yellow]")
         df_summary.to_sql(table_name_to_be_written, conn, if_exists="replace", index=False)
+        save_states(conn, table_name_to_be_written, states, replace=True)
+        sync_session(conn, table_name_to_be_written)
+        conn.commit()
         self.ui.tb_recDb.append("<span style='color: lime;'>[INFO] Summary successfully saved to database!</span>")
         self.ui.tb_recDb.moveCursor(QTextCursor.End)
         print(f"[green]Table '{table_name_to_be_written}' updated with {len(df_summary)} records[/green]")
@@ -165,7 +209,89 @@ class CtrlRecImport:
         self.ui.cb_recDbTable.setCurrentText(table_name_to_be_written)
         self.load_rec_table()
 
+    def save_incremental_summary(self, df_summary, states, removed):
+        """Upsert the rows of the new or modified files and delete the rows of the removed ones"""
+        table_name_to_be_written = "REC_" + Path(self.import_dir).name
+        removed_filenames = [Path(rec_name).stem for rec_name in removed]
+        n_updated = 0 if df_summary is None else len(df_summary)
+
+        conn = sqlite3.connect(str((MODELS_DIR / "rec_data.db").resolve()))
+        with conn:
+            if n_updated or removed_filenames:
+                upsert_summary(conn, table_name_to_be_written, df_summary, removed_filenames)
+                sync_session(conn, table_name_to_be_written)
+            save_states(conn, table_name_to_be_written, states, removed)
+        conn.close()
+
+        if not n_updated and not removed_filenames:
+            self.ui.tb_recDb.append(
+                f"<span style='color: lime;'>[INFO] Table '{table_name_to_be_written}' is up to date</span>"
+            )
+            self.ui.tb_recDb.moveCursor(QTextCursor.End)
+            print(f"[green]Table '{table_name_to_be_written}' is up to date[/green]")
+            return
+
+        if df_summary is not None:
+            print(tabulate(df_summary, headers="keys", tablefmt="pretty"))
+        self.ui.tb_recDb.append(
+            f"<span style='color: lime;'>[INFO] Table '{table_name_to_be_written}' updated: {n_updated} new or "
+            f"modified, {len(removed_filenames)} removed</span>"
+        )
+        self.ui.tb_recDb.moveCursor(QTextCursor.End)
+        print(
+            f"[green]Table '{table_name_to_be_written}' updated: {n_updated} new or modified, "
+            f"{len(removed_filenames)} removed[/green]"
+        )
+        self.ui.cb_recDbTable.setCurrentText(table_name_to_be_written)
+        self.load_rec_table()
+
+    def query_recordings(self):
+        """Filter the recordings of all sessions by tags, date range and filename pattern"""
+        try:
+            tag_filters = parse_tag_filters(self.ui.le_recDbTags.text())
+        except ValueError as e:
+            self.ui.tb_recDb.append(f"<span style='color: tomato;'>[ERROR] Invalid tag filter: {e}</span>")
+            self.ui.tb_recDb.moveCursor(QTextCursor.End)
+            return
+
+        date_from = date_to = None
+        if self.ui.chk_recDbDateRange.isChecked():
+            date_from = self.ui.de_recDbFrom.date().toString("yyyy-MM-dd")
+            date_to = self.ui.de_recDbTo.date().toString("yyyy-MM-dd")
+
+        try:
+            sql, params = compile_query(tag_filters, date_from, date_to, self.ui.le_recDbFilename.text())
+        except ValueError as e:
+            self.ui.tb_recDb.append(f"<span style='color: tomato;'>[ERROR] Invalid tag filter: {e}</span>")
+            self.ui.tb_recDb.moveCursor(QTextCursor.End)
+            return
+
+        # Parameterized query on the indexed normalized tables, rows are fetched as the view needs them
+        query = QSqlQuery(self.db)
+        query.prepare(sql)
+        for param in params:
+            query.addBindValue(param)
+        if not query.exec():
+            self.ui.tb_recDb.append(
+                f"<span style='color: tomato;'>[ERROR] Query failed: {query.lastError().text()}</span>"
+            )
+            self.ui.tb_recDb.moveCursor(QTextCursor.End)
+            print(f"[red]Query failed: {query.lastError().text()}[/red]")
+            return
+
+        self.model_recQuery.setQuery(query)
+        self.ui.tv_recDb.setModel(self.model_recQuery)
+        found = f"{self.model_recQuery.rowCount()}{'+' if self.model_recQuery.canFetchMore() else ''}"
+        self.ui.tb_recDb.append(f"<span style='color: lime;'>[INFO] Query: {found} recording(s) found</span>")
+        self.ui.tb_recDb.moveCursor(QTextCursor.End)
+        print(f"[green]Query returned {found} recording(s)[/green]")
+
     def load_rec_table(self):
+        # Back from query results to the selected table
+        if self.ui.tv_recDb.model() is not self.model_recDB:
+            self.ui.tv_recDb.setModel(self.model_recDB)
+            self.sm_recDB = self.ui.tv_recDb.selectionModel()
+
         self.selected_table = self.ui.cb_recDbTable.currentText()
         if self.selected_table == "":
             # Clear the table view if nothing is selected
@@ -201,6 +327,8 @@ class CtrlRecImport:
             conn = sqlite3.connect(str((MODELS_DIR / "rec_data.db").resolve()))
             cursor = conn.cursor()
             cursor.execute(f'DROP TABLE IF EXISTS "{table_to_delete}"')
+            drop_states(conn, table_to_delete)
+            delete_session(conn, table_to_delete.removeprefix("REC_"))
             conn.commit()
             conn.close()
 
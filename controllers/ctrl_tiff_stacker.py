@@ -1,11 +1,39 @@
 ## Modules
+import os
 from pathlib import Path
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThreadPool, QTimer
 from PySide6.QtGui import QTextCursor
 from rich import print
+from tabulate import tabulate
 
-from classes import DialogGetPath, DirWatcher, ModelCheckableList, ThreadTiffStacker
+from classes import (
+    DialogGetPath,
+    DirWatcher,
+    ModelCheckableList,
+    ModelStackerJobs,
+    ScanTask,
+    ThreadLiveStacker,
+    ThreadTiffStacker,
+)
+from functions.fragment_index import FragmentIndex, discrete
+from functions.live_stacking import LiveRecordingTracker
+from functions.stack_engine import format_eta
+from functions.tiff_preview import PreviewCache
+from functions.tiff_stacking import STAGES, compression_available, output_options, timing_table_rows
+from util.constants import (
+    MODELS_DIR,
+    STACKER_BACKENDS,
+    STACKER_COMPRESSIONS,
+    STACKER_FORMATS,
+    STACKER_LIVE_INTERVAL_MS,
+    STACKER_LIVE_RETRIES,
+    STACKER_LIVE_STABLE_SECONDS,
+    STACKER_TILE,
+    TIFF_PREVIEW_SAMPLES,
+    TIFF_PREVIEW_SIZE,
+    TIFF_PREVIEW_WORKERS,
+)
 
 
 class CtrlTiffStacker:
@@ -16,19 +44,59 @@ class CtrlTiffStacker:
 
         self.ui.chk_selectAllFiles.setVisible(False)
 
+        # Job queue of the current batch (state and fragment progress of each file)
+        self.model_stackerJobs = ModelStackerJobs()
+        self.ui.tv_stackerJobs.setModel(self.model_stackerJobs)
+        self.concatenator_thread = None
+
         # Set up DirWatcher for monitoring TIFF files
-        self.tiff_watcher = DirWatcher(filetype=".tif", target_cb=None)
+        self.tiff_watcher = DirWatcher(filetype=".tif", target_cb=None, exclude_dirs={"merged"})
         self.watching_dir = None
         self.tiff_file_map = {}  # Maps display name -> (full_path, parent_dir)
+        # Persistent fragment index, so directory changes do not re-glob the tree or re-read unchanged headers
+        self.fragment_index = FragmentIndex(MODELS_DIR / "fragment_index.db")
+        self.fragments_by_file = {}  # Maps full_path -> ordered fragment paths
+        # Index refreshes (header reads, recursive walks) run in one background thread, in request order
+        self.index_pool = QThreadPool()
+        self.index_pool.setMaxThreadCount(1)
+        self.index_generation = 0
+        self.index_tasks = []  # Running or queued refreshes, kept alive until their result arrives
+        # Thumbnails and traces of the listed recordings: read lazily (rows being painted) in a small pool,
+        # cached on disk so reopening a folder does not read the fragments again
+        self.preview_cache = PreviewCache(
+            MODELS_DIR / "tiff_preview.db", samples=TIFF_PREVIEW_SAMPLES, size=TIFF_PREVIEW_SIZE
+        )
+        self.preview_pool = QThreadPool()
+        self.preview_pool.setMaxThreadCount(TIFF_PREVIEW_WORKERS)
+        self.preview_tasks = {}  # display name -> running or queued preview task
+        self.preview_generation = 0
+        self.recording_states = {}  # full_path -> (size, mtime) of its fragments, to invalidate outdated previews
+        self.stage_timings = []  # Timing reports of the jobs finished in the current run
+
+        # Live stacking: recordings being acquired are stacked as their fragments land
+        self.live_tracker = LiveRecordingTracker(
+            stable_seconds=STACKER_LIVE_STABLE_SECONDS, max_retries=STACKER_LIVE_RETRIES
+        )
+        self.live_thread = None
+        self.stopping_live_threads = []  # Stopped live threads finishing their fragment set, kept alive until then
+        # Fragments grow without a directory event, so live mode rescans on a timer as well
+        self.live_timer = QTimer()
+        self.live_timer.setInterval(STACKER_LIVE_INTERVAL_MS)
 
         self.connect_signals()
 
     def connect_signals(self):
         self.ui.btn_browseTiffs.clicked.connect(self.browse_tiffs)
+        self.ui.chk_includeSubDir.toggled.connect(self.toggle_sub_dirs)
         self.ui.chk_selectAllFiles.stateChanged.connect(self.select_all_files)
         self.model_tiffFileList.allSelectedCheck.connect(self.check_all_selected)
+        self.model_tiffFileList.previewNeeded.connect(self.load_preview)
         self.ui.btn_startConcat.clicked.connect(self.start_concat)
-        self.tiff_watcher.fileListScanned.connect(self.update_tiff_list)
+        self.ui.btn_pauseConcat.toggled.connect(self.pause_concat)
+        self.ui.btn_cancelConcat.clicked.connect(self.cancel_concat)
+        self.tiff_watcher.fileListChanged.connect(self.update_tiff_list)
+        self.ui.chk_stackerLive.toggled.connect(self.toggle_live_stacking)
+        self.live_timer.timeout.connect(self.rescan_live)
 
     def browse_tiffs(self):
         dlg_get_inputDir = DialogGetPath(title="Please select the folder contains .rec and .tif files")
@@ -42,7 +110,10 @@ class CtrlTiffStacker:
 
         # Set up directory watcher
         self.watching_dir = str(self.input_dir)
-        self.tiff_watcher.set_watched_dir(self.watching_dir)
+        self.live_tracker.reset()
+        self.tiff_watcher.set_watched_dir(self.watching_dir, recursive=self.ui.chk_includeSubDir.isChecked())
+        # Full refresh once (an empty directory produces no diff), the watcher then reports only what changed
+        self.request_index_refresh()
 
         self.ui.gb_tiffBrowser.setTitle(str(self.input_dir))
         self.ui.tb_stacker.append(
@@ -51,22 +122,77 @@ class CtrlTiffStacker:
         self.ui.tb_stacker.moveCursor(QTextCursor.End)
         print(f"[cyan]Watching TIFF directory: {self.watching_dir}[/cyan]")
 
-    def update_tiff_list(self, filenames):
-        """Called when DirWatcher detects changes in the TIFF directory"""
-        if self.ui.chk_includeSubDir.isChecked():
-            list_of_tiffs = sorted(Path(self.watching_dir).rglob("*.tif"))
+    def toggle_sub_dirs(self, include_sub_dir):
+        """Watch the sub-directories (or stop watching them) and refresh the list accordingly"""
+        if self.watching_dir is None:
+            return
+        self.tiff_watcher.set_watched_dir(self.watching_dir, recursive=include_sub_dir)
+        self.request_index_refresh()
+
+    def update_tiff_list(self, added, removed, modified):
+        """Called with the added/removed/modified .tif files (relative to the watched directory) of a DirWatcher scan"""
+        changes = {}  # directory -> (changed filenames, removed filenames)
+        for names, index in ((added + modified, 0), (removed, 1)):
+            for name in names:
+                directory, filename = os.path.split(os.path.join(self.watching_dir, name))
+                changes.setdefault(directory, ([], []))[index].append(filename)
+        self.request_index_refresh(changes)
+
+    def request_index_refresh(self, changes=None):
+        """Refresh the fragment index in the background, changes=None rescans every directory of the list"""
+        if self.watching_dir is None:
+            return
+        self.index_generation += 1
+        task = ScanTask(
+            self.index_generation,
+            self.scan_fragments,
+            self.watching_dir,
+            self.ui.chk_includeSubDir.isChecked(),
+            # Directories followed by the watcher, so no tree walk is needed (empty until its first scan)
+            self.tiff_watcher.watched_directories() if self.tiff_watcher.root == self.watching_dir else [],
+            changes,
+        )
+        task.signals.finished.connect(self.refresh_tiff_list)
+        self.index_tasks.append(task)
+        self.index_pool.start(task)
+
+    def scan_fragments(self, watching_dir, include_sub_dir, directories, changes):
+        """Runs in the index pool: update the fragment index and return all recordings of the directory"""
+        directories = directories or self.fragment_index.list_directories(watching_dir, include_sub_dir)
+        if changes is None:
+            for directory in directories:
+                self.fragment_index.update_directory(directory)
         else:
-            list_of_tiffs = [Path(self.watching_dir) / name for name in filenames]
+            for directory, (changed, removed) in changes.items():
+                self.fragment_index.update_files(directory, changed, removed)
+        return self.fragment_index.recordings(watching_dir, recursive=include_sub_dir, directories=directories)
+
+    def refresh_tiff_list(self, generation, all_recordings):
+        """Rebuild the recordings from a finished index refresh and update only the rows of the list that changed"""
+        self.index_tasks = [task for task in self.index_tasks if task.generation > generation]
+        # Refreshes run in order, so the latest one already contains the changes of the stale ones
+        if generation != self.index_generation:
+            return
+        if isinstance(all_recordings, Exception):
+            self.ui.tb_stacker.append(
+                f"<span style='color: red;'>[ERROR] Failed to scan {self.watching_dir}: {all_recordings}</span>"
+            )
+            self.ui.tb_stacker.moveCursor(QTextCursor.End)
+            return
+
+        # Keep discrete tiffs (recordings split into @NNNN fragments), same grouping as the stack.py command line
+        recordings = discrete(all_recordings)
 
-        # Filter discrete tiffs and track their directory info
+        # Track their directory info
         self.tiff_file_map = {}  # Maps display name -> (full_path, parent_dir)
+        self.fragments_by_file = {}
+        previous_states = self.recording_states
+        self.recording_states = {}
         base_path = Path(self.watching_dir)
 
-        for item in list_of_tiffs:
-            if "@0001" not in item.name:
-                continue
-
-            filename = item.name.replace("@0001", "")
+        for recording, fragments in recordings.items():
+            item = Path(recording)
+            filename = item.name
             parent = item.parent
 
             # Determine directory label
@@ -78,7 +204,23 @@ class CtrlTiffStacker:
                 dir_label = f"({rel_path})"
 
             display_name = f"{filename} {dir_label}"
-            self.tiff_file_map[display_name] = (str(item.with_name(filename)), str(parent))
+            self.tiff_file_map[display_name] = (str(item), str(parent))
+            self.fragments_by_file[str(item)] = fragments
+
+            # A recording that gained fragments or is still being written gets a new preview
+            state = tuple((size, mtime) for _, _, size, mtime in all_recordings[recording])
+            self.recording_states[str(item)] = state
+            if previous_states.get(str(item), state) != state:
+                self.preview_tasks.pop(display_name, None)
+                self.model_tiffFileList.invalidate_preview(display_name)
+
+        if self.live_thread is not None:
+            self.feed_live_stacker(all_recordings)
+
+        # Rescans often find the same recordings (e.g. a fragment grew), nothing to update then
+        unchanged = list(self.tiff_file_map.keys()) == self.model_tiffFileList.list_of_files
+        if unchanged and (self.tiff_file_map or self.live_thread is not None):
+            return
 
         if not self.tiff_file_map:
             self.ui.tb_stacker.append(
@@ -87,16 +229,122 @@ class CtrlTiffStacker:
             self.ui.tb_stacker.moveCursor(QTextCursor.End)
             self.ui.chk_selectAllFiles.setVisible(False)
             self.ui.chk_selectAllFiles.setChecked(False)
-            self.model_tiffFileList.set_tiff_list([], False)
+            self.model_tiffFileList.sync_tiff_list([])
             print("[yellow]No discrete TIFF files found[/yellow]")
             return
 
         self.ui.chk_selectAllFiles.setVisible(True)
 
         all_is_checked = self.ui.chk_selectAllFiles.checkState() == Qt.Checked
-        self.model_tiffFileList.set_tiff_list(list(self.tiff_file_map.keys()), all_is_checked)
+        self.model_tiffFileList.sync_tiff_list(list(self.tiff_file_map.keys()), all_is_checked)
         print(f"[green]Found {len(self.tiff_file_map)} discrete TIFF file(s)[/green]")
 
+    def load_preview(self, display_name):
+        """Called by the model when a row without preview is painted: compute or load it in the preview pool"""
+        if display_name not in self.tiff_file_map or display_name in self.preview_tasks:
+            return
+        full_path = self.tiff_file_map[display_name][0]
+        self.preview_generation += 1
+        task = ScanTask(self.preview_generation, self.read_preview, display_name, self.fragments_by_file[full_path])
+        task.signals.finished.connect(self.show_preview)
+        self.preview_tasks[display_name] = task
+        self.preview_pool.start(task)
+
+    def read_preview(self, display_name, fragments):
+        """Runs in the preview pool: the cached preview of a recording, reading sampled frames if outdated"""
+        try:
+            return display_name, self.preview_cache.preview(fragments)
+        except Exception as e:
+            print(f"[bold red]Failed to read a preview of {display_name}: {e}[/bold red]")
+            # Empty, not None: None is a preview still being read, this one shows "no preview"
+            return display_name, {}
+
+    def show_preview(self, generation, result):
+        display_name, preview = result
+        # A preview read before the recording changed was superseded by a newer task
+        task = self.preview_tasks.get(display_name)
+        if task is None or task.generation != generation:
+            return
+        del self.preview_tasks[display_name]
+        self.model_tiffFileList.set_preview(display_name, preview)
+
+    def toggle_live_stacking(self, enabled):
+        if enabled:
+            self.start_live_stacking()
+        else:
+            self.stop_live_stacking()
+
+    def start_live_stacking(self):
+        if self.watching_dir is None:
+            self.ui.tb_stacker.append(
+                "<span style='color: yellow;'>[WARNING] Select a directory before turning on live stacking</span>"
+            )
+            self.ui.tb_stacker.moveCursor(QTextCursor.End)
+            self.ui.chk_stackerLive.blockSignals(True)
+            self.ui.chk_stackerLive.setChecked(False)
+            self.ui.chk_stackerLive.blockSignals(False)
+            return
+
+        self.live_thread = ThreadLiveStacker()
+        self.live_thread.progress_update.connect(self.update_concatenation_progress)
+        self.live_thread.recording_stacked.connect(self.on_live_recording_stacked)
+        self.live_thread.recording_failed.connect(self.on_live_recording_failed)
+        self.live_thread.start()
+        self.live_timer.start()
+        self.ui.tb_stacker.append(
+            "<span style='color: lime;'>[INFO] Live stacking on: recordings acquired from now on are stacked "
+            "as their fragments land (merged as BigTIFF)</span>"
+        )
+        self.ui.tb_stacker.moveCursor(QTextCursor.End)
+        print(f"[cyan]Live stacking in {self.watching_dir}[/cyan]")
+        self.rescan_live()
+
+    def stop_live_stacking(self):
+        """Unfinished live stacks are kept and continue when live stacking is turned on again"""
+        self.live_timer.stop()
+        if self.live_thread is not None:
+            # The thread writes its current fragment set before it ends, destroying it while it runs would abort
+            thread = self.live_thread
+            self.stopping_live_threads.append(thread)
+            thread.finished.connect(lambda: self.on_live_thread_finished(thread))
+            thread.stop()
+            self.live_thread = None
+        self.live_tracker.reset()
+        self.ui.tb_stacker.append("<span style='color: lime;'>[INFO] Live stacking off</span>")
+        self.ui.tb_stacker.moveCursor(QTextCursor.End)
+        print("[cyan]Live stacking off[/cyan]")
+
+    def on_live_thread_finished(self, thread):
+        self.stopping_live_threads.remove(thread)
+        thread.deleteLater()
+
+    def rescan_live(self):
+        """Growing fragments raise no directory event: refresh the whole index, which re-checks stable recordings"""
+        if not self.index_tasks:
+            self.request_index_refresh()
+
+    def feed_live_stacker(self, recordings):
+        """Pass the landed fragments of the recordings being acquired to the live stacking thread"""
+        for recording, fragments, complete in self.live_tracker.update(recordings):
+            self.live_thread.submit(recording, fragments, complete)
+
+    def on_live_recording_stacked(self, recording):
+        self.live_tracker.finished(recording)
+        print(f"[green]{Path(recording).name} is stacked live[/green]")
+
+    def on_live_recording_failed(self, recording):
+        """Retry a failed live stack at the next rescan, or give it up for the batch stacker after a few failures"""
+        if not self.live_tracker.failed(recording):
+            return
+        if self.live_thread is not None:
+            self.live_thread.discard(recording)
+        self.ui.tb_stacker.append(
+            f"<span style='color: yellow;'>[WARNING] Live stacking of {Path(recording).name} failed "
+            f"{STACKER_LIVE_RETRIES} times, stack it with a batch instead</span>"
+        )
+        self.ui.tb_stacker.moveCursor(QTextCursor.End)
+        print(f"[yellow]Live stacking of {Path(recording).name} given up[/yellow]")
+
     def select_all_files(self):
         """Select or deselect all files in the list view."""
         self.model_tiffFileList.set_all_checked(self.ui.chk_selectAllFiles.isChecked())
@@ -117,6 +365,38 @@ class CtrlTiffStacker:
             print("[yellow]No files selected for concatenation[/yellow]")
             return
 
+        compression = STACKER_COMPRESSIONS[self.ui.cb_stackerCompression.currentText()]
+        if not compression_available(compression):
+            self.ui.tb_stacker.append(
+                f"<span style='color: red;'>[ERROR] {self.ui.cb_stackerCompression.currentText()} compression "
+                "requires the imagecodecs package (pip install imagecodecs)</span>"
+            )
+            self.ui.tb_stacker.moveCursor(QTextCursor.End)
+            print(f"[red]{compression} compression requires imagecodecs[/red]")
+            return
+
+        output = output_options(
+            STACKER_FORMATS[self.ui.cb_stackerFormat.currentText()],
+            compression,
+            STACKER_TILE if self.ui.chk_stackerTiles.isChecked() else None,
+        )
+
+        # Recordings followed by live stacking are written by it, a batch job would write the same output
+        live_recordings = self.live_tracker.active()
+        live_display_names = [
+            name for name in checked_display_names if self.tiff_file_map.get(name, ("",))[0] in live_recordings
+        ]
+        if live_display_names:
+            self.ui.tb_stacker.append(
+                f"<span style='color: yellow;'>[WARNING] Skipped {len(live_display_names)} file(s) being stacked "
+                f"live: {', '.join(live_display_names)}</span>"
+            )
+            self.ui.tb_stacker.moveCursor(QTextCursor.End)
+            print(f"[yellow]Skipped {len(live_display_names)} file(s) being stacked live[/yellow]")
+            checked_display_names = [name for name in checked_display_names if name not in live_display_names]
+            if not checked_display_names:
+                return
+
         # Group files by their parent directory
         files_by_dir = {}
         for display_name in checked_display_names:
@@ -126,8 +406,23 @@ class CtrlTiffStacker:
                     files_by_dir[parent_dir] = []
                 files_by_dir[parent_dir].append(full_path)
 
-        # Disable the start button while processing
-        self.ui.btn_startConcat.setEnabled(False)
+        display_names = {
+            self.tiff_file_map[name][0]: name for name in checked_display_names if name in self.tiff_file_map
+        }
+        # Live stacking no longer picks up the recordings the batch stacks
+        self.live_tracker.claim(display_names)
+
+        # While a batch runs, the start button adds the checked files to it
+        if self.concatenator_thread is not None and self.concatenator_thread.isRunning():
+            self.add_to_batch(files_by_dir, display_names)
+            return
+
+        # The start button now adds files, pause and cancel control the running batch
+        self.ui.btn_startConcat.setText("Add to Batch")
+        self.ui.btn_pauseConcat.setEnabled(True)
+        self.ui.btn_cancelConcat.setEnabled(True)
+        self.model_stackerJobs.clear()
+        self.model_stackerJobs.add_jobs(display_names)
         self.ui.pb_concatenation.setValue(0)
         self.ui.tb_stacker.append("<span style='color: lime;'>[INFO] Starting concatenation process...</span>")
         self.ui.tb_stacker.moveCursor(QTextCursor.End)
@@ -135,20 +430,100 @@ class CtrlTiffStacker:
         print(f"[cyan]Starting concatenation of {total_files} file(s) in {len(files_by_dir)} director(ies)...[/cyan]")
 
         # Create and set up the worker thread with directory grouping
-        self.concatenator_thread = ThreadTiffStacker(files_by_dir, str(self.input_dir))
+        self.concatenator_thread = ThreadTiffStacker(
+            files_by_dir,
+            str(self.input_dir),
+            max_workers=self.ui.sb_stackerWorkers.value(),
+            device_workers=self.ui.sb_stackerDiskWorkers.value(),
+            memory_budget=self.ui.sb_stackerRamBudget.value() * 1024**3,
+            fragments_by_file=self.fragments_by_file,
+            skip_up_to_date=self.ui.chk_skipUpToDate.isChecked(),
+            verify_hash=self.ui.chk_stackerHash.isChecked(),
+            backend=STACKER_BACKENDS[self.ui.cb_stackerBackend.currentText()],
+            output=output,
+            timing_report=self.ui.chk_stackerTimingReport.isChecked(),
+        )
+        self.stage_timings = []
         self.concatenator_thread.progress_update.connect(self.update_concatenation_progress)
+        self.concatenator_thread.stage_timing.connect(self.update_stage_timing)
+        self.concatenator_thread.job_state.connect(self.model_stackerJobs.set_state)
+        self.concatenator_thread.job_progress.connect(self.model_stackerJobs.set_progress)
         self.concatenator_thread.finished.connect(self.on_concatenation_finished)
         self.concatenator_thread.progress_percentage.connect(self.ui.pb_concatenation.setValue)
+        self.concatenator_thread.progress_eta.connect(self.update_progress_eta)
         # Start the thread
         # use start() instead of run(), because run() is a built-in method of QThread
         self.concatenator_thread.start()
 
+    def add_to_batch(self, files_by_dir, display_names):
+        if not self.concatenator_thread.add_files(files_by_dir, self.fragments_by_file):
+            self.ui.tb_stacker.append(
+                "<span style='color: yellow;'>[WARNING] The batch is finishing, start a new one when it is done</span>"
+            )
+            self.ui.tb_stacker.moveCursor(QTextCursor.End)
+            return
+
+        self.model_stackerJobs.add_jobs(display_names)
+        self.ui.tb_stacker.append(
+            f"<span style='color: lime;'>[INFO] {len(display_names)} file(s) added to the running batch</span>"
+        )
+        self.ui.tb_stacker.moveCursor(QTextCursor.End)
+
+    def pause_concat(self, paused):
+        if self.concatenator_thread is None or not self.concatenator_thread.isRunning():
+            return
+        if paused:
+            self.concatenator_thread.pause()
+            self.ui.btn_pauseConcat.setText("Resume")
+        else:
+            self.concatenator_thread.resume()
+            self.ui.btn_pauseConcat.setText("Pause")
+
+    def cancel_concat(self):
+        """Queued jobs are dropped, running jobs stop after their current fragment (streamed ones resume next run)"""
+        if self.concatenator_thread is None or not self.concatenator_thread.isRunning():
+            return
+        self.concatenator_thread.cancel()
+        self.ui.btn_cancelConcat.setEnabled(False)
+        self.ui.btn_pauseConcat.setEnabled(False)
+
+    def update_progress_eta(self, rate, eta):
+        """Byte-weighted percentage with the rolling throughput and the remaining time, on the progress bar"""
+        if self.ui.btn_pauseConcat.isChecked():
+            self.ui.pb_concatenation.setFormat("%p%  Paused")
+            return
+        self.ui.pb_concatenation.setFormat(f"%p%  {rate / 1024**2:.1f} MB/s  ETA {format_eta(eta)}")
+
     def update_concatenation_progress(self, message, color):
         self.ui.tb_stacker.append(f"<span style='color: {color};'>{'&nbsp;' * 7}{message}</span>")
         self.ui.tb_stacker.moveCursor(QTextCursor.End)
 
+    def update_stage_timing(self, timing):
+        self.stage_timings.append(timing)
+        stages = " | ".join(f"{name} {timing['stages'][name]:.2f} s" for name in STAGES)
+        self.ui.tb_stacker.append(f"<span style='color: gray;'>{'&nbsp;' * 7}{stages}</span>")
+        self.ui.tb_stacker.moveCursor(QTextCursor.End)
+
+    def show_timing_summary(self):
+        """Per-stage seconds and MB/s of every finished job, with the totals of the run in the last row"""
+        rows = timing_table_rows(self.stage_timings, self.concatenator_thread.engine.wall_time)
+        self.ui.tb_stacker.append(
+            f"<div style='color: white;'>{tabulate(rows, headers='keys', tablefmt='html', disable_numparse=True)}</div>"
+        )
+        self.ui.tb_stacker.moveCursor(QTextCursor.End)
+        print(tabulate(rows, headers="keys", tablefmt="pretty", disable_numparse=True))
+
     def on_concatenation_finished(self):
+        if self.stage_timings:
+            self.show_timing_summary()
         self.ui.tb_stacker.append("<span style='color: lime;'>[INFO] Concatenation process completed!</span>")
         self.ui.tb_stacker.moveCursor(QTextCursor.End)
-        self.ui.btn_startConcat.setEnabled(True)
+        self.ui.btn_startConcat.setText("Start")
+        self.ui.pb_concatenation.setFormat("%p%")
+        self.ui.btn_pauseConcat.blockSignals(True)
+        self.ui.btn_pauseConcat.setChecked(False)
+        self.ui.btn_pauseConcat.blockSignals(False)
+        self.ui.btn_pauseConcat.setText("Pause")
+        self.ui.btn_pauseConcat.setEnabled(False)
+        self.ui.btn_cancelConcat.setEnabled(False)
         print("[green]Concatenation process completed![/green]")
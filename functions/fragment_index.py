@@ -0,0 +1,190 @@
+## Modules
+# Standard library imports
+import os
+import sqlite3
+from pathlib import Path
+
+# Third-party imports
+import numpy as np
+import tifffile
+
+
+def split_fragment_name(filename):
+    """Split 'name@0003.tif' into ('name', 3); the first file of a recording ('name.tif') is fragment 0"""
+    # Extension matched case-insensitively (name@0003.TIF), as the glob it replaces does on Windows
+    stem = filename[: -len(".tif")] if filename.lower().endswith(".tif") else filename
+    base, sep, seq = stem.rpartition("@")
+    if sep and seq.isdigit():
+        return base, int(seq)
+    return stem, 0
+
+
+def read_frame_count(path):
+    """Number of frames in a TIFF, from its header only (None while the file is unreadable, e.g. still written)"""
+    try:
+        with tifffile.TiffFile(path) as tif:
+            return int(np.prod(tif.series[0].shape[:-2], dtype=np.int64))
+    except Exception:
+        return None
+
+
+def discrete(recordings):
+    """Keep the recordings split into name@NNNN.tif fragments (the ones worth stacking) -> ordered fragment paths
+
+    recordings is the output of FragmentIndex.recordings.
+    """
+    discrete = {}
+    for recording, fragments in recordings.items():
+        fragment_paths = [path for path, *_ in fragments]
+        if any("@0001" in Path(path).name for path in fragment_paths):
+            discrete[recording] = fragment_paths
+    return discrete
+
+
+class FragmentIndex:
+    """Persistent index of PCO fragments: recording -> ordered fragments with frame counts, sizes and mtimes
+
+    Directories are refreshed incrementally: only new or modified fragments get their header read,
+    and the result is stored in SQLite so the next session starts from the cached state.
+    The in-memory cache is not locked: use an index from one thread at a time (e.g. a single-thread pool).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        # directory -> {filename: (size, mtime, frames)}
+        self.cache = {}
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS FRAGMENTS (
+                    directory TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    size INTEGER,
+                    mtime REAL,
+                    frames INTEGER,
+                    PRIMARY KEY (directory, filename)
+                )
+            """)
+
+    def load_directory(self, directory):
+        if directory not in self.cache:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute(
+                    "SELECT filename, size, mtime, frames FROM FRAGMENTS WHERE directory = ?", (directory,)
+                ).fetchall()
+            self.cache[directory] = {filename: (size, mtime, frames) for filename, size, mtime, frames in rows}
+        return self.cache[directory]
+
+    def update_directory(self, directory):
+        """Rescan one directory and refresh only the entries whose size or mtime changed. Returns True on change."""
+        directory = str(directory)
+        cached = self.load_directory(directory)
+
+        current = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith(".tif"):
+                        stat = entry.stat()
+                        current[entry.name] = (stat.st_size, stat.st_mtime)
+        except OSError:
+            pass
+
+        upserts = []
+        for filename, (size, mtime) in current.items():
+            old = cached.get(filename)
+            if old is not None and old[0] == size and old[1] == mtime and old[2] is not None:
+                continue
+            frames = read_frame_count(os.path.join(directory, filename))
+            cached[filename] = (size, mtime, frames)
+            upserts.append((directory, filename, size, mtime, frames))
+
+        removed = [filename for filename in cached if filename not in current]
+        for filename in removed:
+            del cached[filename]
+
+        if upserts or removed:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.executemany("INSERT OR REPLACE INTO FRAGMENTS VALUES (?, ?, ?, ?, ?)", upserts)
+                conn.executemany(
+                    "DELETE FROM FRAGMENTS WHERE directory = ? AND filename = ?",
+                    [(directory, filename) for filename in removed],
+                )
+        return bool(upserts or removed)
+
+    def update_files(self, directory, changed=(), removed=()):
+        """Refresh only the named files of a directory (e.g. a DirWatcher diff) without listing it again"""
+        directory = str(directory)
+        cached = self.load_directory(directory)
+
+        upserts = []
+        for filename in changed:
+            try:
+                stat = os.stat(os.path.join(directory, filename))
+            except OSError:
+                removed = [*removed, filename]
+                continue
+            old = cached.get(filename)
+            if old is not None and old[0] == stat.st_size and old[1] == stat.st_mtime and old[2] is not None:
+                continue
+            frames = read_frame_count(os.path.join(directory, filename))
+            cached[filename] = (stat.st_size, stat.st_mtime, frames)
+            upserts.append((directory, filename, stat.st_size, stat.st_mtime, frames))
+
+        removed = [filename for filename in removed if cached.pop(filename, None) is not None]
+        if upserts or removed:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.executemany("INSERT OR REPLACE INTO FRAGMENTS VALUES (?, ?, ?, ?, ?)", upserts)
+                conn.executemany(
+                    "DELETE FROM FRAGMENTS WHERE directory = ? AND filename = ?",
+                    [(directory, filename) for filename in removed],
+                )
+        return bool(upserts or removed)
+
+    def list_directories(self, root, recursive=False):
+        """root and, if recursive, its sub-directories (merged/ output folders are skipped)"""
+        directories = [str(root)]
+        if recursive:
+            for dirpath, dirnames, _ in os.walk(root):
+                dirnames[:] = sorted(name for name in dirnames if name != "merged")
+                directories.extend(os.path.join(dirpath, name) for name in dirnames)
+        return directories
+
+    def update_tree(self, root, recursive=False):
+        changed = False
+        for directory in self.list_directories(root, recursive):
+            changed |= self.update_directory(directory)
+        return changed
+
+    def recordings(self, root, recursive=False, directories=None):
+        """Map each recording (path of name.tif) to its fragments [(path, frames, size, mtime), ...] in order
+
+        directories (e.g. the ones a DirWatcher follows) replaces walking the tree under root.
+        """
+        recordings = {}
+        for directory in directories or self.list_directories(root, recursive):
+            for filename, (size, mtime, frames) in self.load_directory(directory).items():
+                base, seq = split_fragment_name(filename)
+                recording = os.path.join(directory, f"{base}.tif")
+                fragment = (seq, os.path.join(directory, filename), frames, size, mtime)
+                recordings.setdefault(recording, []).append(fragment)
+
+        return {
+            recording: [fragment[1:] for fragment in sorted(fragments)]
+            for recording, fragments in sorted(recordings.items())
+        }
+
+    def discrete_recordings(self, root, recursive=False):
+        """Recordings split into name@NNNN.tif fragments (the ones worth stacking) -> ordered fragment paths"""
+        return discrete(self.recordings(root, recursive))
+
+    def fragments(self, file):
+        """Ordered fragment paths of a recording, read from the index instead of globbing"""
+        directory = str(Path(file).parent)
+        base = Path(file).stem
+        cached = self.load_directory(directory)
+        fragments = sorted(
+            (split_fragment_name(filename)[1], os.path.join(directory, filename))
+            for filename in cached
+            if split_fragment_name(filename)[0] == base
+        )
+        return [path for _, path in fragments]
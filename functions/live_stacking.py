@@ -0,0 +1,236 @@
+## Modules
+# Standard library imports
+import os
+from pathlib import Path
+from time import time
+
+# Third-party imports
+import tifffile
+
+# Local application imports
+from functions.tiff_stacking import (
+    load_checkpoint,
+    load_manifest,
+    manifest_entry,
+    merged_output_path,
+    output_options,
+    read_fragment,
+    save_checkpoint,
+    save_manifest,
+    source_signature,
+)
+
+# Live stacks grow page by page while the camera writes, which only a plain (Big)TIFF allows:
+# ImageJ hyperstacks and OME-TIFF store the frame count up front
+LIVE_OUTPUT = output_options("bigtiff")
+
+
+def rec_sidecar(recording):
+    """The .rec file saved next to a recording once it is acquired (name.tif -> name.tif.rec)"""
+    return Path(f"{recording}.rec")
+
+
+def live_paths(output_path):
+    """Growing output of a live stack and its checkpoint (renamed/removed when the recording is complete)"""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.name}.live"), output_path.with_name(f"{output_path.name}.live.json")
+
+
+def append_landed_fragments(recording, fragments, report=print):
+    """Bring the live stack of a recording up to the given landed fragments, return how many were appended
+
+    Frames are appended to merged/m_name.tif.live and m_name.tif.live.json records the appended sources with the
+    file size after each fragment. A later call (or session) continues the same file, and starts it over when a
+    recorded fragment changed or the file does not end where the checkpoint says.
+    """
+    output_path = merged_output_path(recording, LIVE_OUTPUT)
+    output_path.parent.mkdir(exist_ok=True)
+    live_path, checkpoint_path = live_paths(output_path)
+    sources = source_signature(fragments)
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    done = checkpoint.get("sources", [])
+    if not live_path.exists() or done != sources[: len(done)] or os.path.getsize(live_path) != checkpoint.get("size"):
+        if done:
+            report(f"{output_path.name}: live stack is out of date, starting over", "yellow")
+        live_path.unlink(missing_ok=True)
+        checkpoint = {"sources": [], "size": 0, "frame_shape": None, "dtype": None}
+
+    start = len(checkpoint["sources"])
+    for i in range(start, len(fragments)):
+        data = read_fragment(fragments[i])
+        frame_shape = list(data.shape[-2:])
+        if checkpoint["frame_shape"] is None:
+            checkpoint["frame_shape"] = frame_shape
+            checkpoint["dtype"] = str(data.dtype.newbyteorder("="))
+        elif frame_shape != checkpoint["frame_shape"] or str(data.dtype.newbyteorder("=")) != checkpoint["dtype"]:
+            raise ValueError(
+                f"{Path(fragments[i]).name} has frames {frame_shape} ({data.dtype}),"
+                f" expected {checkpoint['frame_shape']} ({checkpoint['dtype']})"
+            )
+
+        # One page per frame without shape metadata, so the appended pages read back as a single (T, Y, X) series
+        tifffile.imwrite(
+            live_path,
+            data.reshape(-1, *frame_shape),
+            append=True,
+            bigtiff=True,
+            contiguous=True,
+            metadata=None,
+            photometric="minisblack",
+        )
+        del data
+
+        checkpoint["sources"].append(sources[i])
+        checkpoint["size"] = os.path.getsize(live_path)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    return len(fragments) - start
+
+
+def finish_live_stack(recording, fragments):
+    """Rename the live stack of a complete recording to merged/m_name.tif and record it in the manifest"""
+    output_path = merged_output_path(recording, LIVE_OUTPUT)
+    live_path, checkpoint_path = live_paths(output_path)
+    original_stat = os.stat(recording)
+
+    os.replace(live_path, output_path)
+    os.utime(str(output_path), (original_stat.st_atime, original_stat.st_mtime))
+    os.remove(checkpoint_path)
+
+    merged_dir = str(output_path.parent)
+    manifest = load_manifest(merged_dir)
+    manifest[output_path.name] = manifest_entry(output_path, source_signature(fragments), LIVE_OUTPUT)
+    save_manifest(merged_dir, manifest)
+    return output_path
+
+
+def discard_live_stack(recording):
+    """Remove the growing output and checkpoint of a live stack that is given up"""
+    for path in live_paths(merged_output_path(recording, LIVE_OUTPUT)):
+        path.unlink(missing_ok=True)
+
+
+def update_live_stack(recording, fragments, complete, report=print):
+    """Append the landed fragments of a recording and finish its stack once complete. Returns True when finished.
+
+    Errors are raised, so the caller can have LiveRecordingTracker retry the recording.
+    """
+    img_basename = Path(recording).stem
+    appended = append_landed_fragments(recording, fragments, report)
+    if appended:
+        report(f"{img_basename}: {len(fragments)} fragment(s) stacked live", "gray")
+    if not complete:
+        return False
+    output_path = finish_live_stack(recording, fragments)
+    report(f"{img_basename} is concatenated live into {output_path.name}.", "aquamarine")
+    return True
+
+
+class LiveRecordingTracker:
+    """Follow recordings while they are acquired and decide which of their fragments can be stacked
+
+    The camera writes the fragments of a recording in turn, so a fragment has landed once the next one exists.
+    A recording is complete when its .rec sidecar appears, or when none of its fragments changed size or mtime
+    for stable_seconds. Recordings already finished when they are first seen are left to the batch stacker.
+    A recording is followed until its live stack is finished; one whose stacking failed max_retries times is
+    given up and left to the batch stacker as well.
+    """
+
+    def __init__(self, stable_seconds=30, max_retries=3):
+        self.stable_seconds = stable_seconds
+        self.max_retries = max_retries
+        # recording -> {"snapshot", "changed", "landed", "complete", "failures"}
+        self.states = {}
+        self.ignored = set()
+
+    def reset(self):
+        self.states = {}
+        self.ignored = set()
+
+    def acquiring(self):
+        """Recordings that are followed and not complete yet"""
+        return [recording for recording, state in self.states.items() if not state["complete"]]
+
+    def update(self, recordings, now=None):
+        """Compare a scan with the previous ones, return [(recording, landed fragment paths, complete), ...]
+
+        recordings maps each recording to its fragments [(path, frames, size, mtime), ...] in order
+        (FragmentIndex.recordings); only recordings with new landed fragments or just completed are returned.
+        """
+        now = time() if now is None else now
+        updates = []
+        for recording, fragments in recordings.items():
+            # Not split into fragments (yet), nothing to stack
+            if recording in self.ignored or len(fragments) < 2:
+                continue
+
+            snapshot = [(size, mtime) for _, _, size, mtime in fragments]
+            state = self.states.get(recording)
+            if state is None:
+                newest = max(mtime for _, mtime in snapshot)
+                if rec_sidecar(recording).exists() or now - newest >= self.stable_seconds:
+                    self.ignored.add(recording)
+                    continue
+                state = self.states[recording] = {
+                    "snapshot": None,
+                    "changed": now,
+                    "landed": 0,
+                    "complete": False,
+                    "failures": 0,
+                }
+            if state["complete"]:
+                continue
+
+            if snapshot != state["snapshot"]:
+                state["snapshot"] = snapshot
+                state["changed"] = now
+            readable = all(frames is not None for _, frames, _, _ in fragments)
+            complete = readable and (
+                rec_sidecar(recording).exists() or now - state["changed"] >= self.stable_seconds
+            )
+
+            # The last fragment may still be written until the recording is complete
+            landed = len(fragments) if complete else len(fragments) - 1
+            for i, (_, frames, _, _) in enumerate(fragments[:landed]):
+                if frames is None:
+                    landed = i
+                    break
+
+            if landed > state["landed"] or complete:
+                state["landed"] = landed
+                state["complete"] = complete
+                updates.append((recording, [path for path, *_ in fragments[:landed]], complete))
+
+        return updates
+
+    def active(self):
+        """Recordings whose live stack is not finished: acquiring, or complete and still being finished"""
+        return set(self.states)
+
+    def claim(self, recordings):
+        """Leave recordings to a batch job, so the live stacker never writes the same output at the same time"""
+        for recording in recordings:
+            self.states.pop(recording, None)
+            self.ignored.add(recording)
+
+    def finished(self, recording):
+        """The live stack of a recording is done, stop following it"""
+        self.states.pop(recording, None)
+        self.ignored.add(recording)
+
+    def failed(self, recording):
+        """Stacking a recording failed: the next update sends all its landed fragments again
+
+        Returns True when the recording is given up (max_retries reached), it is then no longer followed.
+        """
+        state = self.states.get(recording)
+        if state is None:
+            return False
+        state["failures"] += 1
+        if state["failures"] >= self.max_retries:
+            self.finished(recording)
+            return True
+        state["landed"] = 0
+        state["complete"] = False
+        return False
@@ -0,0 +1,246 @@
+## Modules
+# Standard library imports
+import hashlib
+import os
+import re
+
+# Sidecar table of rec_data.db: size, mtime (and optional hash) of every imported .rec file, per REC_<folder> table
+STATE_TABLE = "rec_import_state"
+
+# Normalized layout of rec_data.db: every imported folder (session) in the same tables, kept in sync with the
+# REC_<folder> tables, so questions across days are one indexed query instead of a UNION over folders
+SESSIONS_TABLE = "rec_sessions"
+RECORDINGS_TABLE = "rec_recordings"
+TAGS_TABLE = "rec_tags"
+NORMALIZED_TABLES = {SESSIONS_TABLE, RECORDINGS_TABLE, TAGS_TABLE}
+# PRAGMA user_version once the normalized tables exist and the folder tables are migrated; bumped when the parsing
+# of the tags changes, so the folder tables are imported again (2: EXPO in us and s)
+SCHEMA_VERSION = 2
+
+
+def is_sidecar_table(table_name):
+    """Bookkeeping and normalized tables of rec_data.db, not to be listed as imported folders"""
+    return table_name == STATE_TABLE or table_name in NORMALIZED_TABLES or table_name.startswith("sqlite_")
+
+
+def content_hash(raw):
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def stat_rec_file(rec_path):
+    stat = os.stat(rec_path)
+    return stat.st_size, stat.st_mtime
+
+
+def ensure_state_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            table_name TEXT NOT NULL,
+            rec_name TEXT NOT NULL,
+            size INTEGER,
+            mtime REAL,
+            hash TEXT,
+            PRIMARY KEY (table_name, rec_name)
+        )
+    """)
+
+
+def load_states(conn, table_name):
+    """rec name -> (size, mtime, hash) of the files last imported into table_name"""
+    ensure_state_table(conn)
+    rows = conn.execute(
+        f"SELECT rec_name, size, mtime, hash FROM {STATE_TABLE} WHERE table_name = ?", (table_name,)
+    ).fetchall()
+    return {rec_name: (size, mtime, digest) for rec_name, size, mtime, digest in rows}
+
+
+def save_states(conn, table_name, states, removed=(), replace=False):
+    """Record the states of imported files, replace=True forgets the previous states of the table first"""
+    ensure_state_table(conn)
+    if replace:
+        conn.execute(f"DELETE FROM {STATE_TABLE} WHERE table_name = ?", (table_name,))
+    conn.executemany(
+        f"DELETE FROM {STATE_TABLE} WHERE table_name = ? AND rec_name = ?",
+        [(table_name, rec_name) for rec_name in removed],
+    )
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?, ?, ?)",
+        [(table_name, rec_name, *state) for rec_name, state in states.items()],
+    )
+
+
+def drop_states(conn, table_name):
+    ensure_state_table(conn)
+    conn.execute(f"DELETE FROM {STATE_TABLE} WHERE table_name = ?", (table_name,))
+
+
+def upsert_summary(conn, table_name, df_summary, removed_filenames=()):
+    """Replace the rows of the files in df_summary (by Filename), delete removed ones and append the new rows
+
+    Tags that the table does not have yet become new columns.
+    """
+    existing_columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+    for column in df_summary.columns if df_summary is not None else []:
+        if column not in existing_columns:
+            conn.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{column}" TEXT')
+
+    filenames = list(removed_filenames)
+    if df_summary is not None:
+        filenames += df_summary["Filename"].tolist()
+    conn.executemany(f'DELETE FROM "{table_name}" WHERE "Filename" = ?', [(filename,) for filename in filenames])
+    if df_summary is not None:
+        df_summary.to_sql(table_name, conn, if_exists="append", index=False)
+
+
+def parse_number(value, unit):
+    """Number of a tag value with an optional unit suffix ("500p", "20Hz", "50ms"), None if it is not one"""
+    match = re.fullmatch(rf"\s*(\d+(?:\.\d+)?)\s*(?:{unit})?\s*", value, flags=re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
+# Exposure units the tagger writes (ms, us) and seconds, as a factor to milliseconds
+EXPO_UNIT_TO_MS = {"ms": 1.0, "us": 1e-3, "µs": 1e-3, "s": 1e3}
+
+
+def parse_exposure(value):
+    """Exposure in ms of an EXPO value ("50ms", "500us", "0.5s"; ms without a unit), None if it is not one"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(ms|us|µs|s)?\s*", value, flags=re.IGNORECASE)
+    if match is None:
+        return None
+    number, unit = match.groups()
+    return float(number) * EXPO_UNIT_TO_MS[(unit or "ms").lower()]
+
+
+def parse_frames(value):
+    number = parse_number(value, "p")
+    return int(number) if number is not None and number.is_integer() else None
+
+
+def parse_level(value):
+    """Light level as written by the tagger ("8", "MAX"), also accepting the older "LV8" and "LVMAX" """
+    match = re.fullmatch(r"\s*(?:LV)?(\d+|MAX)\s*", value, flags=re.IGNORECASE)
+    return match.group(1).upper() if match else None
+
+
+# Known tags: column of rec_recordings and parser of the tag value (None when the value does not parse)
+TYPED_TAGS = {
+    "OBJ": ("obj", str),
+    "EXC": ("exc", str),
+    "EMI": ("emi", str),
+    "LEVEL": ("level", parse_level),
+    "EXPO": ("expo_ms", parse_exposure),
+    "FRAMES": ("frames", parse_frames),
+    "FPS": ("fps", lambda value: parse_number(value, "Hz")),
+    "SLICE": ("slice", str),
+    "AT": ("site", str),
+    "SENSOR": ("sensor", str),
+    "CAM_TRIG_MODE": ("cam_trig_mode", str),
+}
+TYPED_COLUMN_TYPES = {"level": "TEXT", "expo_ms": "REAL", "frames": "INTEGER", "fps": "REAL"}
+INDEXED_COLUMNS = ["rec_date", "filename", "session", "fps", "emi", "exc", "obj", "frames", "expo_ms", "level"]
+
+
+def session_date(session):
+    """ISO date of a session folder named YYYY_MM_DD (or starting with it), None otherwise"""
+    match = re.match(r"(\d{4})[_-](\d{2})[_-](\d{2})", session)
+    return "-".join(match.groups()) if match else None
+
+
+def ensure_normalized_schema(conn):
+    typed_columns = ",\n".join(
+        f"{column} {TYPED_COLUMN_TYPES.get(column, 'TEXT')}" for column, _ in TYPED_TAGS.values()
+    )
+    # Separate statements, executescript would commit the caller's transaction
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SESSIONS_TABLE} (
+            session TEXT PRIMARY KEY,
+            source_table TEXT,
+            rec_date TEXT
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RECORDINGS_TABLE} (
+            id INTEGER PRIMARY KEY,
+            session TEXT NOT NULL,
+            rec_date TEXT,
+            filename TEXT NOT NULL,
+            timestamp TEXT,
+            {typed_columns}
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TAGS_TABLE} (
+            recording_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (recording_id, key)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TAGS_TABLE}_key_value ON {TAGS_TABLE} (key, value)")
+    for column in INDEXED_COLUMNS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{RECORDINGS_TABLE}_{column} ON {RECORDINGS_TABLE} ({column})")
+
+
+def delete_session(conn, session):
+    ensure_normalized_schema(conn)
+    conn.execute(
+        f"DELETE FROM {TAGS_TABLE} WHERE recording_id IN (SELECT id FROM {RECORDINGS_TABLE} WHERE session = ?)",
+        (session,),
+    )
+    conn.execute(f"DELETE FROM {RECORDINGS_TABLE} WHERE session = ?", (session,))
+    conn.execute(f"DELETE FROM {SESSIONS_TABLE} WHERE session = ?", (session,))
+
+
+def sync_session(conn, table_name):
+    """Rebuild the session of a REC_<folder> table in the normalized tables from the table's rows
+
+    Known tags go to typed columns; other tags, and known ones whose value does not parse, go to the tags table
+    as text. Empty values are not stored.
+    """
+    session = table_name.removeprefix("REC_")
+    delete_session(conn, session)
+    rec_date = session_date(session)
+    conn.execute(f"INSERT INTO {SESSIONS_TABLE} VALUES (?, ?, ?)", (session, table_name, rec_date))
+
+    cursor = conn.execute(f'SELECT * FROM "{table_name}"')
+    columns = [description[0] for description in cursor.description]
+    typed_columns = [column for column, _ in TYPED_TAGS.values()]
+    insert_recording = (
+        f"INSERT INTO {RECORDINGS_TABLE} (session, rec_date, filename, timestamp, {', '.join(typed_columns)})"
+        f" VALUES ({', '.join('?' * (4 + len(typed_columns)))})"
+    )
+    tags = []
+    for row in cursor.fetchall():
+        values = {key: value for key, value in zip(columns, row) if value not in (None, "")}
+        typed = dict.fromkeys(typed_columns)
+        extra = {}
+        for key, value in values.items():
+            if key in ("Filename", "Timestamp"):
+                continue
+            column, parse = TYPED_TAGS.get(key, (None, None))
+            parsed = parse(str(value)) if parse else None
+            if parsed is None:
+                extra[key] = str(value)
+            else:
+                typed[column] = parsed
+        # Folders not named by date fall back to the date in the filename (YYYY_MM_DD-NNNN.tif)
+        row_date = rec_date or session_date(str(values.get("Filename", "")))
+        recording_id = conn.execute(
+            insert_recording,
+            (session, row_date, values.get("Filename"), values.get("Timestamp"), *typed.values()),
+        ).lastrowid
+        tags += [(recording_id, key, value) for key, value in extra.items()]
+    conn.executemany(f"INSERT INTO {TAGS_TABLE} VALUES (?, ?, ?)", tags)
+
+
+def migrate_folder_tables(conn, table_names):
+    """Create the normalized tables and import the REC_<folder> tables into them, once per database"""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return False
+    ensure_normalized_schema(conn)
+    for table_name in table_names:
+        sync_session(conn, table_name)
+    # Statistics for the query planner to pick the most selective index
+    conn.execute("ANALYZE")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return True
@@ -1,11 +1,8 @@
-def rec_encoding_checker(rec_path):
-    """Detect the encoding of a .rec file by checking its BOM (Byte Order Mark).
+def detect_encoding(raw):
+    """Detect the encoding of .rec content from its BOM (Byte Order Mark), given its first bytes (or all of them).
 
-    Returns the encoding string to be used when opening the file for reading or writing.
+    Returns the encoding string to be used to decode the bytes.
     """
-    with open(rec_path, "rb") as f:
-        raw = f.read(4)  # Only need the first few bytes for BOM detection
-
     # UTF-16 BOM: FF FE (little-endian) or FE FF (big-endian)
     if raw[:2] in (b"\xff\xfe", b"\xfe\xff"):
         return "utf-16"
@@ -16,3 +13,14 @@ def rec_encoding_checker(rec_path):
 
     # No BOM — assume plain UTF-8
     return "utf-8"
+
+
+def rec_encoding_checker(rec_path):
+    """Detect the encoding of a .rec file by checking its BOM (Byte Order Mark).
+
+    Returns the encoding string to be used when opening the file for reading or writing.
+    """
+    with open(rec_path, "rb") as f:
+        raw = f.read(4)  # Only need the first few bytes for BOM detection
+
+    return detect_encoding(raw)
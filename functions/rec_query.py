@@ -0,0 +1,86 @@
+## Modules
+# Standard library imports
+import re
+
+# Local application imports
+from functions.rec_db import RECORDINGS_TABLE, TAGS_TABLE, TYPED_TAGS
+
+NUMERIC_COLUMNS = {"fps", "frames", "expo_ms"}
+# KEY, operator (":" is the .rec notation of "=") and value of a tag filter
+TAG_FILTER_REGEX = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)\s*(!=|>=|<=|=|>|<|:)\s*(.+)$")
+
+# Column of the query results -> its header (the tag name for typed columns), ad-hoc tags are joined into "TAGS"
+RESULT_COLUMNS = {"session": "Session", "rec_date": "Date", "filename": "Filename", "timestamp": "Timestamp"} | {
+    column: key for key, (column, _) in TYPED_TAGS.items()
+}
+
+
+def parse_tag_filters(text):
+    """[(KEY, operator, value), ...] of filters like "FPS=40 EMI=525 FRAMES>=500 NOTE:puff"
+
+    Values cannot contain spaces unless quoted ('NOTE="not enough"').
+    """
+    filters = []
+    for token in re.findall(r"""[^\s"']+(?:"[^"]*"|'[^']*')?""", text):
+        match = TAG_FILTER_REGEX.match(token)
+        if match is None:
+            raise ValueError(f"'{token}' is not a KEY=VALUE filter")
+        key, operator, value = match.groups()
+        filters.append((key.upper(), "=" if operator == ":" else operator, value.strip("\"'")))
+    return filters
+
+
+def glob_pattern(pattern):
+    """GLOB pattern of a filename filter: * and ? wildcards, a plain text matches anywhere in the filename"""
+    pattern = pattern.strip()
+    if not any(wildcard in pattern for wildcard in "*?["):
+        pattern = f"*{pattern}*"
+    return pattern
+
+
+def compile_query(tag_filters=(), date_from=None, date_to=None, filename_pattern=""):
+    """Parameterized SQL over the normalized tables and its parameters
+
+    Known tags compare their typed column (indexed, numeric for FPS, FRAMES and EXPO), with the value parsed like
+    the imported tags (EXPO=500us is EXPO 0.5 ms); other tags, and known ones whose value does not parse (stored as
+    text by the import), look up the (key, value) index of the tags table. Dates are ISO strings (inclusive), the
+    filename pattern is a GLOB whose literal prefix can use the filename index.
+    """
+    conditions = []
+    params = []
+    for key, operator, value in tag_filters:
+        column, parse = TYPED_TAGS.get(key, (None, None))
+        parsed = parse(value) if parse else None
+        if parsed is not None:
+            if operator not in ("=", "!=") and column not in NUMERIC_COLUMNS:
+                raise ValueError(f"{key} can only be compared with = or !=")
+            conditions.append(f"r.{column} {operator} ?")
+            params.append(parsed)
+        else:
+            if operator not in ("=", "!=") and column in NUMERIC_COLUMNS:
+                raise ValueError(f"'{value}' is not a valid {key} value")
+            if operator not in ("=", "!="):
+                raise ValueError(f"{key} can only be compared with = or !=")
+            exists = f"EXISTS (SELECT 1 FROM {TAGS_TABLE} t WHERE t.recording_id = r.id AND t.key = ? AND t.value = ?)"
+            conditions.append(exists if operator == "=" else f"NOT {exists}")
+            params += [key, value]
+
+    if date_from:
+        conditions.append("r.rec_date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("r.rec_date <= ?")
+        params.append(date_to)
+    if filename_pattern.strip():
+        conditions.append("r.filename GLOB ?")
+        params.append(glob_pattern(filename_pattern))
+
+    sql = (
+        f"SELECT {', '.join(f'r.{column} AS {header}' for column, header in RESULT_COLUMNS.items())},"
+        f" (SELECT group_concat(t.key || ': ' || t.value, ', ') FROM {TAGS_TABLE} t WHERE t.recording_id = r.id)"
+        f" AS TAGS FROM {RECORDINGS_TABLE} r"
+    )
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY r.rec_date, r.filename"
+    return sql, params
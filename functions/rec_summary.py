@@ -0,0 +1,93 @@
+## Modules
+# Standard library imports
+from pathlib import Path
+
+# Third-party imports
+import pandas as pd
+
+# Local application imports
+from functions.rec_encoding_checker import detect_encoding
+
+
+def parse_rec_lines(lines):
+    """Timestamp and tag lines of a .rec file, the tags being the "KEY: value" lines after the "Comment:" header"""
+    timestamp = None
+    tags_from = len(lines)
+    for line_num, line_content in enumerate(lines):
+        if "Time" in line_content:
+            timestamp = line_content.split(" ")[-1]
+
+        if "Comment:" in line_content:
+            tags_from = line_num + 2
+            break
+
+    return timestamp, lines[tags_from:]
+
+
+def convert_pairs_to_dict(list_of_pairs):
+    dict_of_pairs = {}
+    for item in list_of_pairs:
+        if ":" not in item:
+            continue
+        # split at first ":"
+        key, value = item.split(":", 1)
+        dict_of_pairs[key.strip()] = value.strip()
+    return dict_of_pairs
+
+
+def parse_rec_bytes(rec_path, raw):
+    """Filename (stem of the .rec), timestamp and tags dict of the raw content of a .rec file
+
+    The BOM is detected from the same bytes that are decoded, so the file is read only once (one round trip per
+    file, which matters on network shares).
+    """
+    original_content = raw.decode(detect_encoding(raw)).splitlines()
+    timestamp, tag_lines = parse_rec_lines(original_content)
+    return Path(rec_path).stem, timestamp, convert_pairs_to_dict(tag_lines)
+
+
+def read_rec_file(rec_path):
+    """Filename (stem of the .rec), timestamp and tags dict of a .rec file"""
+    with open(rec_path, mode="rb") as f:
+        raw = f.read()
+    return parse_rec_bytes(rec_path, raw)
+
+
+class SummaryBuilder:
+    """Columnar buffers of the .rec summary, turned into a DataFrame once all files are added
+
+    Appending to one list per column keeps an import linear in the number of files, whereas growing a DataFrame
+    row by row (pd.concat in a loop) copies it every time. Columns are Filename, Timestamp, then the tags in the
+    order they first appear; a tag missing from a file is None (NULL in the database).
+    """
+
+    def __init__(self):
+        self.columns = {"Filename": [], "Timestamp": []}
+        self.n_rows = 0
+
+    def add(self, filename, timestamp, tags):
+        self.columns["Filename"].append(filename)
+        self.columns["Timestamp"].append(timestamp)
+        for key, value in tags.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * self.n_rows
+            if len(column) == self.n_rows:
+                column.append(value)
+        self.n_rows += 1
+
+        # Pad the tags this file does not have
+        for column in self.columns.values():
+            if len(column) < self.n_rows:
+                column.append(None)
+
+    def to_frame(self):
+        return pd.DataFrame(self.columns).replace("None", "")
+
+
+def summarize_rec_files(list_of_rec_paths):
+    """Read every .rec file and build their summary DataFrame in one step"""
+    builder = SummaryBuilder()
+    for rec_path in list_of_rec_paths:
+        builder.add(*read_rec_file(rec_path))
+    return builder.to_frame()
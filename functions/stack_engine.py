@@ -0,0 +1,521 @@
+## Modules
+# Standard library imports
+import multiprocessing
+import queue
+import threading
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from time import monotonic, sleep, time
+
+# Third-party imports
+from rich import print
+
+# Local application imports
+from functions.system_resources import available_memory, storage_device
+from functions.tiff_stacking import (
+    DEFAULT_OUTPUT,
+    JobControl,
+    StackCancelled,
+    concatenate_in_worker,
+    concatenate_recording,
+    estimate_job_memory,
+    init_worker_report,
+    is_up_to_date,
+    list_fragments,
+    load_manifest,
+    manifest_entry,
+    merged_output_path,
+    save_manifest,
+    save_timing_report,
+    source_signature,
+)
+
+# States of a job in StackEngine.job_states
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+# Batch progress is sent at most every PROGRESS_INTERVAL seconds, its throughput averaged over THROUGHPUT_WINDOW
+PROGRESS_INTERVAL = 0.25
+THROUGHPUT_WINDOW = 10.0
+
+
+def format_eta(seconds):
+    """h:mm:ss (or mm:ss) for an ETA in seconds, --:-- when it is unknown (negative)"""
+    if seconds < 0:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class StackEngine:
+    """Qt-free core of the TIFF stacker: manifest checks, per-device scheduling, RAM budget and worker pool
+
+    Progress goes through callbacks, so ThreadTiffStacker forwards them to Qt signals and stack.py prints them:
+    report(message, color), progress(percentage), throughput(bytes per second, ETA in seconds or -1),
+    timing(timing report of a finished job), job_state(file, state) and job_progress(file, fragments done, total).
+    The batch percentage is weighted by fragment sizes and advances after every fragment.
+    pause(), resume(), cancel() and add_files() may be called from another thread while run() is going.
+    """
+
+    def __init__(
+        self,
+        files_to_process,
+        main_dir,
+        max_workers=2,
+        streaming=True,
+        backend="thread",
+        device_workers=2,
+        device_limits=None,
+        memory_budget=None,
+        fragments_by_file=None,
+        skip_up_to_date=True,
+        verify_hash=False,
+        output=None,
+        timing_report=False,
+        report=None,
+        progress=None,
+        throughput=None,
+        timing=None,
+        job_state=None,
+        job_progress=None,
+    ):
+        self.report = report or (lambda message, color: print(f"[{color}]{message}[/{color}]"))
+        self.progress = progress or (lambda percentage: None)
+        self.throughput = throughput or (lambda rate, eta: None)
+        self.timing = timing or (lambda timing: None)
+        self.job_state = job_state or (lambda file, state: None)
+        self.job_progress = job_progress or (lambda file, done, total: None)
+        # files_to_process can be either a list (old behavior) or dict (grouped by directory)
+        if isinstance(files_to_process, dict):
+            self.files_by_dir = files_to_process
+            self.files_to_process = []
+            for files in files_to_process.values():
+                self.files_to_process.extend(files)
+        else:
+            # Old behavior: all files in main_dir
+            self.files_by_dir = {main_dir: files_to_process}
+            self.files_to_process = files_to_process
+
+        self.main_dir = main_dir
+        # Ordered fragment lists from the FragmentIndex, files missing here fall back to globbing
+        self.fragments_by_file = fragments_by_file or {}
+        self.max_workers = max_workers
+        # Format, compression and tiling of the merged stacks (see functions.tiff_stacking.output_options)
+        self.output = output or DEFAULT_OUTPUT
+        # streaming=True copies fragments one by one into a preallocated output (peak RAM ~ one fragment)
+        # streaming=False keeps the old behavior of stacking the whole recording in RAM before writing
+        self.streaming = streaming
+        # "thread" runs the workers in this process, "process" uses a process pool to avoid the GIL
+        self.backend = backend
+        # Concurrency limit of each storage device queue (device_limits overrides it per st_dev)
+        self.device_workers = device_workers
+        self.device_limits = device_limits or {}
+        # Jobs only start while the summed memory estimates of running jobs stay under this budget (bytes)
+        if memory_budget is None:
+            free_memory = available_memory()
+            memory_budget = int(free_memory * 0.8) if free_memory else None
+        self.memory_budget = memory_budget
+        self.memory_in_flight = 0
+        self.job_memory = {}  # file -> estimated peak RAM in bytes
+        # Outputs whose manifest entry still matches their sources are skipped on rerun
+        self.skip_up_to_date = skip_up_to_date
+        self.verify_hash = verify_hash
+        self.manifests = {}  # merged dir -> manifest dict
+        self.signatures = {}  # file -> source signature taken before the job started
+        # Per-stage timings of finished jobs, optionally saved as a JSON report next to each merged/ folder
+        self.timing_report = timing_report
+        self.timings = {}  # file -> timing report
+        self.failed = []  # files whose job raised or reported an error
+        self.wall_time = None  # seconds the last run took, for the total throughput
+        self.processed_count = 0
+        self.total_count = len(self.files_to_process)
+        # Job queue: state of every file of the batch, pause/cancel checked by workers between fragments
+        self.job_states = {}  # file -> one of JOB_STATES
+        self.job_control = JobControl(use_processes=backend == "process")
+        self.pending_by_device = {}  # storage device -> deque of queued files
+        self.devices = {}  # parent dir -> storage device
+        self.running_by_device = Counter()
+        # Files added while running, picked up by the run loop; refused once the batch is over or cancelled
+        self.incoming = queue.Queue()
+        self.accepting = True
+        self.accepting_lock = threading.Lock()
+        # Byte-weighted progress: bytes of the finished fragments of each file, over the size of all fragments
+        self.bytes_total = 0
+        self.bytes_done = {}  # file -> bytes of its finished fragments
+        self.bytes_done_before = 0  # bytes of the earlier jobs of files queued again in the batch
+        self.bytes_processed = 0  # bytes actually stacked in this run (skipped outputs excluded), for the throughput
+        self.rate_samples = deque()  # (time, bytes_processed) within THROUGHPUT_WINDOW
+        self.last_progress_time = 0.0
+        # Thread workers report their fragments from the pool threads, the run loop from its own thread
+        self.progress_lock = threading.Lock()
+
+    def concatenate_process(self, file):
+        return concatenate_recording(
+            file,
+            self.streaming,
+            self.report,
+            self.fragments_by_file.get(file),
+            self.output,
+            self.job_control,
+            lambda done, total: self.fragment_done(file, done, total),
+        )
+
+    def fragment_sizes(self, file):
+        return [source["size"] for source in self.signatures.get(file, [])]
+
+    def fragment_done(self, file, done, total):
+        """Per-fragment progress of a job: advances its bytes and the batch progress"""
+        bytes_done = sum(self.fragment_sizes(file)[:done])
+        with self.progress_lock:
+            self.bytes_processed += max(0, bytes_done - self.bytes_done.get(file, 0))
+            self.bytes_done[file] = bytes_done
+        self.job_progress(file, done, total)
+        self.update_progress()
+
+    def complete_bytes(self, file):
+        """A finished, failed, cancelled or skipped job no longer has bytes to go"""
+        with self.progress_lock:
+            self.bytes_done[file] = sum(self.fragment_sizes(file))
+
+    def update_progress(self, force=False):
+        """Send the byte-weighted percentage, rolling throughput and ETA, at most every PROGRESS_INTERVAL"""
+        with self.progress_lock:
+            now = monotonic()
+            if not force and now - self.last_progress_time < PROGRESS_INTERVAL:
+                return
+            self.last_progress_time = now
+
+            self.rate_samples.append((now, self.bytes_processed))
+            while len(self.rate_samples) > 2 and now - self.rate_samples[0][0] > THROUGHPUT_WINDOW:
+                self.rate_samples.popleft()
+            (t_first, bytes_first), (t_last, bytes_last) = self.rate_samples[0], self.rate_samples[-1]
+            rate = (bytes_last - bytes_first) / (t_last - t_first) if t_last > t_first else 0.0
+            bytes_done = self.bytes_done_before + sum(self.bytes_done.values())
+
+        if self.bytes_total:
+            self.progress(int(bytes_done / self.bytes_total * 100))
+        else:
+            self.progress(int(self.processed_count / max(self.total_count, 1) * 100))
+        self.throughput(rate, (self.bytes_total - bytes_done) / rate if rate > 0 else -1)
+
+    def set_job_state(self, file, state):
+        self.job_states[file] = state
+        self.job_state(file, state)
+
+    def pause(self):
+        self.job_control.pause()
+        self.report("Paused, running jobs stop after their current fragment.", "yellow")
+
+    def resume(self):
+        self.job_control.resume()
+        self.report("Resumed.", "yellow")
+
+    def cancel(self):
+        """Cancel queued jobs at once and running jobs after their current fragment"""
+        with self.accepting_lock:
+            self.accepting = False
+        self.job_control.cancel()
+        self.report("Cancelling...", "yellow")
+
+    def add_files(self, files_by_dir, fragments_by_file=None):
+        """Queue more files into the running batch, returns False if the batch no longer accepts files"""
+        with self.accepting_lock:
+            if not self.accepting:
+                return False
+            self.incoming.put((files_by_dir, fragments_by_file or {}))
+        return True
+
+    def take_incoming(self):
+        """Queue the files added by add_files() since the last call (run loop side)"""
+        while True:
+            try:
+                files_by_dir, fragments_by_file = self.incoming.get_nowait()
+            except queue.Empty:
+                return
+
+            new_files = []
+            for parent_dir, files in files_by_dir.items():
+                for file in files:
+                    # Files already queued or running in this batch are not added twice
+                    if self.job_states.get(file) in ("queued", "running"):
+                        continue
+                    self.files_by_dir.setdefault(parent_dir, [])
+                    if file not in self.files_by_dir[parent_dir]:
+                        self.files_by_dir[parent_dir].append(file)
+                    if file in fragments_by_file:
+                        self.fragments_by_file[file] = fragments_by_file[file]
+                    new_files.append(file)
+            if new_files:
+                self.files_to_process.extend(new_files)
+                self.total_count += len(new_files)
+                self.report(f"Added {len(new_files)} file(s) to the batch", "white")
+                self.queue_files(new_files)
+
+    def queue_files(self, files):
+        """Skip up-to-date outputs and put the other files in the queue of their storage device"""
+        for parent_dir in {str(Path(file).parent) for file in files}:
+            merged_path = Path(parent_dir) / "merged"
+            if not merged_path.exists():
+                merged_path.mkdir(parents=True, exist_ok=True)
+                print(f"[cyan]Created merged folder: {merged_path}[/cyan]")
+
+        # A file queued again after its job ended runs once more: its bytes are added to the total again and the
+        # bytes of the earlier job stay done, so the percentage never goes back
+        with self.progress_lock:
+            for file in files:
+                self.bytes_done_before += self.bytes_done.pop(file, 0)
+        files_to_run = self.check_manifests(files)
+        self.bytes_total += sum(sum(self.fragment_sizes(file)) for file in files)
+        # One bounded queue per storage device, so a slow disk cannot starve a fast one
+        for file in files_to_run:
+            parent_dir = str(Path(file).parent)
+            if parent_dir not in self.devices:
+                self.devices[parent_dir] = storage_device(parent_dir)
+            self.pending_by_device.setdefault(self.devices[parent_dir], deque()).append(file)
+            with self.progress_lock:
+                self.bytes_done[file] = 0
+            self.set_job_state(file, "queued")
+        self.estimate_memory(files_to_run)
+        return files_to_run
+
+    def cancel_pending(self):
+        if not any(self.pending_by_device.values()):
+            return
+        for pending in self.pending_by_device.values():
+            while pending:
+                file = pending.popleft()
+                self.set_job_state(file, "cancelled")
+                self.complete_bytes(file)
+                self.processed_count += 1
+        self.update_progress(force=True)
+
+    def check_manifests(self, files):
+        """Compare every output with the manifest of its merged folder, return the files that need (re)stacking"""
+        files_to_run = []
+        for file in files:
+            output_path = merged_output_path(file, self.output)
+            merged_dir = str(output_path.parent)
+            if merged_dir not in self.manifests:
+                self.manifests[merged_dir] = load_manifest(merged_dir)
+
+            try:
+                self.signatures[file] = source_signature(
+                    self.fragments_by_file.get(file) or list_fragments(file), self.verify_hash
+                )
+            except OSError:
+                # Missing fragments: let the job run and report the error itself
+                files_to_run.append(file)
+                continue
+
+            entry = self.manifests[merged_dir].get(output_path.name)
+            if self.skip_up_to_date and is_up_to_date(entry, output_path, self.signatures[file], self.output):
+                self.report(f"{output_path.name} is up to date, skipped.", "gray")
+                self.set_job_state(file, "done")
+                self.complete_bytes(file)
+                self.processed_count += 1
+            else:
+                files_to_run.append(file)
+
+        return files_to_run
+
+    def record_manifest(self, file):
+        """Store the sources of a finished output, so the next run can skip it while they are unchanged"""
+        if file not in self.signatures:
+            return
+
+        output_path = merged_output_path(file, self.output)
+        merged_dir = str(output_path.parent)
+        self.manifests[merged_dir][output_path.name] = manifest_entry(output_path, self.signatures[file], self.output)
+        save_manifest(merged_dir, self.manifests[merged_dir])
+
+    def relay_reports(self, report_queue):
+        """Pass the messages that process-pool workers put into the report queue to the matching callback"""
+        if report_queue is None:
+            return
+
+        while True:
+            try:
+                callback_name, *args = report_queue.get_nowait()
+            except queue.Empty:
+                return
+            getattr(self, callback_name)(*args)
+
+    def device_limit(self, device):
+        return self.device_limits.get(device, self.device_workers)
+
+    def estimate_memory(self, files):
+        """Read the fragment headers of every file to estimate the RAM each job will need"""
+        for file in files:
+            try:
+                self.job_memory[file] = estimate_job_memory(file, self.streaming, self.fragments_by_file.get(file))
+            except Exception:
+                # Unreadable headers: let the job start and report the error itself
+                self.job_memory[file] = 0
+
+    def fits_memory_budget(self, file):
+        """A job fits if it stays under the budget, or if nothing else runs (a large job then runs alone)"""
+        if self.memory_budget is None or self.memory_in_flight == 0:
+            return True
+        return self.memory_in_flight + self.job_memory.get(file, 0) <= self.memory_budget
+
+    def dispatch_jobs(self, executor, futures):
+        """Submit queued files round-robin across devices while the device, the pool and the RAM budget allow
+
+        Each device queue is FIFO among the files that fit the budget; a file that does not fit waits until enough
+        jobs finish (it runs alone at the latest when nothing else is running).
+        """
+        if self.job_control.is_paused() or self.job_control.is_cancelled():
+            return
+
+        submitted = True
+        while submitted and len(futures) < self.max_workers:
+            submitted = False
+            for device, pending in self.pending_by_device.items():
+                if not pending or self.running_by_device[device] >= self.device_limit(device):
+                    continue
+                if len(futures) >= self.max_workers:
+                    break
+                # First queued file that fits: a large job waiting for RAM does not hold back smaller ones behind it
+                file = next((file for file in pending if self.fits_memory_budget(file)), None)
+                if file is None:
+                    continue
+
+                pending.remove(file)
+                if self.backend == "process":
+                    future = executor.submit(
+                        concatenate_in_worker, file, self.streaming, self.fragments_by_file.get(file), self.output
+                    )
+                else:
+                    future = executor.submit(self.concatenate_process, file)
+                futures[future] = (device, file)
+                self.set_job_state(file, "running")
+                self.running_by_device[device] += 1
+                self.memory_in_flight += self.job_memory.get(file, 0)
+                submitted = True
+
+    def run(self):
+        for file in self.files_to_process:
+            self.report(f"{Path(file).name}", "deepskyblue")
+
+        length_horizontal_line = max(len(Path(f).name) for f in self.files_to_process) + 1
+        self.report("-" * length_horizontal_line, "white")
+        self.report(f"Total files to concatenate: {self.total_count}", "white")
+        self.report(f"Backend: {self.backend}, workers: {self.max_workers}", "white")
+        self.report(
+            f"Output: {self.output['format']}, compression: {self.output['compression'] or 'none'}"
+            f"{', tiled' if self.output['tile'] else ''}",
+            "white",
+        )
+
+        # Process files in parallel
+        t_start = time()
+
+        # Create merged folders, skip up-to-date outputs and queue the rest per storage device
+        self.queue_files(self.files_to_process)
+        if self.processed_count:
+            self.report(f"Up-to-date files skipped: {self.processed_count}", "white")
+            self.update_progress(force=True)
+        self.report(f"Storage devices: {len(self.pending_by_device)}", "white")
+
+        if self.memory_budget is not None:
+            largest_job = max(self.job_memory.values(), default=0)
+            self.report(
+                f"Memory budget: {self.memory_budget / 1024**3:.1f} GB, largest job: {largest_job / 1024**3:.2f} GB",
+                "white",
+            )
+
+        if self.backend == "process":
+            # Workers cannot call the callbacks of this process, their messages come back through this queue
+            report_queue = multiprocessing.Queue()
+            executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=init_worker_report,
+                initargs=(report_queue, self.job_control),
+            )
+        else:
+            report_queue = None
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        futures = {}  # future -> (storage device, file)
+        with executor:
+            self.dispatch_jobs(executor, futures)
+            while True:
+                self.take_incoming()
+                if self.job_control.is_cancelled():
+                    self.cancel_pending()
+                has_pending = any(self.pending_by_device.values())
+                if not futures and not has_pending:
+                    # Close the batch; files added in the meantime are still picked up
+                    with self.accepting_lock:
+                        self.accepting = False
+                    if self.incoming.empty():
+                        break
+                    continue
+
+                if futures:
+                    done, _ = wait(futures, timeout=0.1, return_when=FIRST_COMPLETED)
+                else:
+                    # Paused with nothing running
+                    done = ()
+                    sleep(0.1)
+                self.relay_reports(report_queue)
+                for future in done:
+                    self.finish_job(future, *futures.pop(future))
+                self.dispatch_jobs(executor, futures)
+                # Keeps the throughput and ETA current between fragments
+                self.update_progress()
+
+        # Workers flush their queue when they exit, pick up the last messages
+        self.relay_reports(report_queue)
+
+        t_end = time() - t_start
+        self.wall_time = t_end
+        if self.timing_report:
+            self.save_timing_reports(t_end)
+        if self.job_control.is_cancelled():
+            cancelled = sum(state == "cancelled" for state in self.job_states.values())
+            self.report(f"Concatenation cancelled ({cancelled} file(s)) after {t_end:.2f} seconds<br>", "yellow")
+        else:
+            self.report(f"All concatenation completed in {t_end:.2f} seconds<br>", "aqua")
+
+    def finish_job(self, future, device, file):
+        self.running_by_device[device] -= 1
+        self.memory_in_flight -= self.job_memory.get(file, 0)
+        if isinstance(future.exception(), StackCancelled):
+            self.set_job_state(file, "cancelled")
+        elif future.exception() is not None:
+            self.report(f"Worker failed: {future.exception()}", "red")
+            self.failed.append(file)
+            self.set_job_state(file, "failed")
+        elif future.result():
+            self.record_manifest(file)
+            self.timings[file] = future.result()
+            self.timing(future.result())
+            self.set_job_state(file, "done")
+        else:
+            self.failed.append(file)
+            self.set_job_state(file, "failed")
+        # Update progress
+        self.complete_bytes(file)
+        self.processed_count += 1
+        self.update_progress(force=True)
+
+    def save_timing_reports(self, wall_time):
+        """One JSON timing report per directory, written next to its merged/ folder"""
+        run_info = {
+            "backend": self.backend,
+            "workers": self.max_workers,
+            "device_workers": self.device_workers,
+            "streaming": self.streaming,
+            "output": self.output,
+        }
+        for parent_dir, files in self.files_by_dir.items():
+            timings = [self.timings[file] for file in files if file in self.timings]
+            if not timings:
+                continue
+            try:
+                report_path = save_timing_report(parent_dir, timings, run_info, wall_time)
+            except OSError as e:
+                self.report(f"Could not save timing report in {parent_dir}: {e}", "red")
+                continue
+            self.report(f"Timing report saved: {report_path}", "white")
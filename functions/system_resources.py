@@ -0,0 +1,92 @@
+## Modules
+# Standard library imports
+import ctypes
+import os
+import sys
+
+
+def available_memory():
+    """Return the available physical memory in bytes, or None if it cannot be determined on this platform"""
+    if sys.platform == "win32":
+
+        class MemoryStatusEx(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatusEx()
+        status.dwLength = ctypes.sizeof(MemoryStatusEx)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+        return None
+
+    # MemAvailable also counts reclaimable page cache, which SC_AVPHYS_PAGES does not
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def suggest_worker_count(bytes_per_worker, memory_fraction=0.8):
+    """Number of parallel workers that fits both the CPU count and the available memory"""
+    cpu_count = os.cpu_count() or 1
+    free_memory = available_memory()
+    if free_memory is None or bytes_per_worker <= 0:
+        return cpu_count
+
+    return max(1, min(cpu_count, int(free_memory * memory_fraction // bytes_per_worker)))
+
+
+def storage_device(path):
+    """Identifier of the storage device holding path (st_dev, the volume serial number on Windows)"""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+
+# File systems of network shares, on which change notifications (inotify) are not delivered for remote writes
+NETWORK_FILESYSTEMS = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "afpfs", "9p", "fuse.sshfs"}
+
+
+def is_network_path(path):
+    """True if path is on a network share (UNC or mapped drive on Windows, a network mount in /proc/mounts)"""
+    path = os.path.abspath(path)
+    if sys.platform == "win32":
+        drive = os.path.splitdrive(path)[0]
+        if drive.startswith("\\\\"):
+            return True
+        # DRIVE_REMOTE
+        return bool(drive) and ctypes.windll.kernel32.GetDriveTypeW(f"{drive}\\") == 4
+
+    # The mount point with the longest matching prefix holds the path
+    fs_type, mount_length = None, -1
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace("\\040", " ")
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) > mount_length:
+                    fs_type, mount_length = fields[2], len(mount_point)
+    except OSError:
+        return False
+    return fs_type in NETWORK_FILESYSTEMS
@@ -0,0 +1,134 @@
+## Modules
+# Standard library imports
+import json
+import os
+import sqlite3
+
+# Third-party imports
+import numpy as np
+import tifffile
+
+
+def sample_indices(n_frames, samples):
+    """Up to samples frame indices spread evenly over a fragment, first and last included"""
+    if n_frames <= 0:
+        return []
+    return sorted(set(np.linspace(0, n_frames - 1, min(samples, n_frames)).round().astype(int).tolist()))
+
+
+def read_sampled_frames(path, samples):
+    """Frame count of a fragment and [(index, frame), ...] of a few sampled frames, without reading the others"""
+    with tifffile.TiffFile(path) as tif:
+        series = tif.series[0]
+        frame_shape = series.shape[-2:]
+        n_frames = int(np.prod(series.shape[:-2], dtype=np.int64))
+        indices = sample_indices(n_frames, samples)
+        if series.dataoffset is not None and series.size:
+            # Uncompressed contiguous data (PCO fragments): memory map it and touch only the sampled frames
+            data = np.memmap(
+                path,
+                dtype=series.dtype.newbyteorder(tif.byteorder),
+                mode="r",
+                offset=series.dataoffset,
+                shape=(n_frames, *frame_shape),
+            )
+            frames = [(i, np.array(data[i])) for i in indices]
+            del data
+        else:
+            frames = [(i, tif.pages[i].asarray().reshape(frame_shape)) for i in indices]
+    return n_frames, frames
+
+
+def make_thumbnail(frame, size):
+    """Frame subsampled to at most size pixels per side, contrast stretched (1-99 percentile) to uint8"""
+    step = max(1, int(np.ceil(max(frame.shape) / size)))
+    small = frame[::step, ::step].astype(np.float32)
+    low, high = np.percentile(small, (1, 99))
+    scaled = np.clip((small - low) / max(high - low, 1e-6), 0, 1)
+    return np.ascontiguousarray((scaled * 255).astype(np.uint8))
+
+
+def compute_preview(fragments, samples=3, size=48):
+    """Frame count, mean-intensity trace of sampled frames and a thumbnail of a recording
+
+    Only samples frames per fragment are read; the trace holds (frame index in the recording, mean) pairs and
+    the thumbnail comes from the middle of the middle fragment.
+    """
+    frames_total = 0
+    trace = []
+    thumbnail = None
+    middle = len(fragments) // 2
+    for k, path in enumerate(fragments):
+        n_frames, sampled = read_sampled_frames(path, samples)
+        trace.extend((frames_total + i, float(frame.mean())) for i, frame in sampled)
+        if k == middle and sampled:
+            thumbnail = make_thumbnail(sampled[len(sampled) // 2][1], size)
+        frames_total += n_frames
+    return {"frames": frames_total, "fragments": len(fragments), "trace": trace, "thumbnail": thumbnail}
+
+
+class PreviewCache:
+    """Disk cache of recording previews in SQLite, keyed by recording path and mtime (of its newest fragment)
+
+    Safe to use from several pool threads: every call opens its own connection.
+    """
+
+    def __init__(self, db_path, samples=3, size=48):
+        self.db_path = str(db_path)
+        self.samples = samples
+        self.size = size
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS PREVIEWS (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL,
+                    frames INTEGER,
+                    fragments INTEGER,
+                    trace TEXT,
+                    thumb_height INTEGER,
+                    thumb_width INTEGER,
+                    thumbnail BLOB
+                )
+            """)
+
+    def connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def preview(self, fragments):
+        """Cached preview of the recording made of fragments, computed (and stored) when missing or outdated"""
+        path = str(fragments[0])
+        mtime = max(os.stat(fragment).st_mtime for fragment in fragments)
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT frames, fragments, trace, thumb_height, thumb_width, thumbnail FROM PREVIEWS"
+                " WHERE path = ? AND mtime = ? AND fragments = ?",
+                (path, mtime, len(fragments)),
+            ).fetchone()
+        if row is not None:
+            frames, n_fragments, trace, height, width, thumbnail = row
+            if thumbnail is not None:
+                thumbnail = np.frombuffer(thumbnail, dtype=np.uint8).reshape(height, width)
+            return {
+                "frames": frames,
+                "fragments": n_fragments,
+                "trace": [tuple(point) for point in json.loads(trace)],
+                "thumbnail": thumbnail,
+            }
+
+        preview = compute_preview(fragments, self.samples, self.size)
+        thumbnail = preview["thumbnail"]
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO PREVIEWS VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    mtime,
+                    preview["frames"],
+                    preview["fragments"],
+                    json.dumps(preview["trace"]),
+                    None if thumbnail is None else thumbnail.shape[0],
+                    None if thumbnail is None else thumbnail.shape[1],
+                    None if thumbnail is None else thumbnail.tobytes(),
+                ),
+            )
+        return preview
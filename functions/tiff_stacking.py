@@ -0,0 +1,618 @@
+## Modules
+# Standard library imports
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter, time
+
+# Third-party imports
+import numpy as np
+import tifffile
+
+# Manifest kept in each merged/ folder, records the sources of every output to skip up-to-date ones on rerun
+MANIFEST_NAME = "stack_manifest.json"
+
+# Layout of the merged stack: extra TiffWriter keywords and output suffix of each format
+OUTPUT_FORMATS = {
+    "imagej": ({"imagej": True}, ".tif"),
+    "bigtiff": ({"bigtiff": True}, ".tif"),
+    "ome": ({"ome": True, "bigtiff": True}, ".ome.tif"),
+}
+# Compressions that tifffile can only encode through the optional imagecodecs package
+CODEC_COMPRESSIONS = {"zstd", "lzw"}
+# Output written when no options are given (also assumed for manifest entries older than the options)
+DEFAULT_OUTPUT = {"format": "imagej", "compression": None, "tile": None}
+
+# Stages timed by StageTimer, in the order of a job
+STAGES = ("scan", "read", "copy", "write", "utime")
+
+# Queue used by process-pool workers to relay messages back to StackEngine (set by init_worker_report)
+_report_queue = None
+# JobControl shared with the stacker, so process-pool workers can be paused and cancelled
+_job_control = None
+
+
+class StackCancelled(Exception):
+    """Raised by JobControl.checkpoint() between fragments once the batch is cancelled"""
+
+
+class JobControl:
+    """Cooperative pause and cancel of stacking jobs, checked by the workers between fragments
+
+    Uses multiprocessing events for the process backend (passed to the workers by init_worker_report).
+    """
+
+    def __init__(self, use_processes=False):
+        event = multiprocessing.Event if use_processes else threading.Event
+        self.cancel_event = event()
+        # Set while running, cleared while paused
+        self.resume_event = event()
+        self.resume_event.set()
+
+    def pause(self):
+        self.resume_event.clear()
+
+    def resume(self):
+        self.resume_event.set()
+
+    def cancel(self):
+        self.cancel_event.set()
+        # Wake paused workers so they can stop
+        self.resume_event.set()
+
+    def is_paused(self):
+        return not self.resume_event.is_set()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def checkpoint(self):
+        """Block while paused, raise StackCancelled once cancelled"""
+        self.resume_event.wait()
+        if self.cancel_event.is_set():
+            raise StackCancelled("cancelled")
+
+
+def init_worker_report(report_queue, job_control=None):
+    """Initializer of process-pool workers, keeps the queue that relays messages to the GUI and the job control"""
+    global _report_queue, _job_control
+    _report_queue = report_queue
+    _job_control = job_control
+
+
+def report_to_queue(message, color):
+    _report_queue.put(("report", message, color))
+
+
+def concatenate_in_worker(file, streaming=True, fragments=None, output=None):
+    """Entry point of process-pool workers (must be a module-level function to be picklable)"""
+
+    def job_progress(done, total):
+        _report_queue.put(("fragment_done", file, done, total))
+
+    return concatenate_recording(file, streaming, report_to_queue, fragments, output, _job_control, job_progress)
+
+
+def output_options(output_format="imagej", compression=None, tile=None):
+    """Options of the merged stack; kept JSON friendly because they are stored in the manifest"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return {"format": output_format, "compression": compression, "tile": list(tile) if tile else None}
+
+
+def compression_available(compression):
+    """zlib is built into tifffile, zstd and LZW need imagecodecs"""
+    if compression not in CODEC_COMPRESSIONS:
+        return True
+    try:
+        import imagecodecs  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def writer_options(output):
+    """TiffWriter keywords (file level, page level) of an output option dict"""
+    file_options = dict(OUTPUT_FORMATS[output["format"]][0])
+    page_options = {"metadata": {"axes": "TYX"}, "photometric": "minisblack"}
+    if output["compression"]:
+        # Horizontal differencing before compression, tifffile picks the predictor matching the dtype
+        page_options.update(compression=output["compression"], predictor=True)
+    if output["tile"]:
+        page_options["tile"] = tuple(output["tile"])
+    return file_options, page_options
+
+
+def list_fragments(file):
+    """Return name.tif followed by its name@NNNN.tif fragments in order"""
+    img_dir = Path(file).parent
+    img_basename = Path(file).stem
+    return [file] + sorted(img_dir.glob(f"{img_basename}@*.tif"))
+
+
+def merged_output_path(file, output=None):
+    suffix = OUTPUT_FORMATS[(output or DEFAULT_OUTPUT)["format"]][1]
+    return Path(file).parent / "merged" / f"m_{Path(file).stem}{suffix}"
+
+
+def fast_hash(path, chunk_size=1024**2):
+    """blake2b of the file size plus its first and last MiB, cheap enough to run on every fragment"""
+    digest = hashlib.blake2b(digest_size=16)
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(chunk_size))
+        if size > chunk_size:
+            f.seek(max(chunk_size, size - chunk_size))
+            digest.update(f.read(chunk_size))
+    return digest.hexdigest()
+
+
+def source_signature(fragments, with_hash=False):
+    """Name, size, mtime (and optionally fast hash) of every fragment of a recording"""
+    signature = []
+    for path in fragments:
+        stat = os.stat(path)
+        entry = {"name": Path(path).name, "size": stat.st_size, "mtime": stat.st_mtime}
+        if with_hash:
+            entry["hash"] = fast_hash(path)
+        signature.append(entry)
+    return signature
+
+
+def load_manifest(merged_dir):
+    try:
+        with open(Path(merged_dir) / MANIFEST_NAME, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(merged_dir, manifest):
+    """Write the manifest through a temporary file so a crash never leaves it half written"""
+    manifest_path = Path(merged_dir) / MANIFEST_NAME
+    temp_path = manifest_path.with_suffix(".json.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(temp_path, manifest_path)
+
+
+def is_up_to_date(entry, output_path, signature, output=None):
+    """True if the manifest entry is complete, has the same sources and options and the output was not touched since"""
+    if not entry or not entry.get("complete"):
+        return False
+    if entry.get("output", DEFAULT_OUTPUT) != (output or DEFAULT_OUTPUT):
+        return False
+
+    # Hashes are only compared when the current signature has them
+    keys = signature[0].keys() if signature else ()
+    recorded_sources = [{key: source.get(key) for key in keys} for source in entry.get("sources", [])]
+    if recorded_sources != signature:
+        return False
+
+    try:
+        stat = os.stat(output_path)
+    except OSError:
+        return False
+    return stat.st_size == entry.get("output_size") and stat.st_mtime == entry.get("output_mtime")
+
+
+def manifest_entry(output_path, signature, output=None):
+    stat = os.stat(output_path)
+    return {
+        "sources": signature,
+        "output": output or DEFAULT_OUTPUT,
+        "output_size": stat.st_size,
+        "output_mtime": stat.st_mtime,
+        "complete": True,
+    }
+
+
+def read_fragment_shapes(all_files):
+    """Read frame count, frame shape and dtype of every fragment from the TIFF headers (no pixel decoding)"""
+    frame_counts = []
+    frame_shape = None
+    dtype = None
+    for tiff_file in all_files:
+        with tifffile.TiffFile(tiff_file) as tif:
+            series = tif.series[0]
+            shape = series.shape
+            if frame_shape is None:
+                frame_shape = shape[-2:]
+                dtype = series.dtype
+            elif shape[-2:] != frame_shape or series.dtype != dtype:
+                raise ValueError(
+                    f"{Path(tiff_file).name} has shape {shape} ({series.dtype}), expected {frame_shape} ({dtype})"
+                )
+            frame_counts.append(int(np.prod(shape[:-2], dtype=np.int64)))
+
+    return frame_counts, frame_shape, dtype
+
+
+def read_fragment(tiff_file):
+    """Pixel data of a fragment without decoding it when possible
+
+    PCO fragments are uncompressed and contiguous, so they are returned as a read-only np.memmap view of the file:
+    the copy into the output then reads straight from the page cache instead of going through a decoded heap array.
+    Compressed or scattered files fall back to tifffile.imread.
+    """
+    with tifffile.TiffFile(tiff_file) as tif:
+        series = tif.series[0]
+        # dataoffset is only set when the series is uncompressed and stored in one contiguous block
+        offset = series.dataoffset
+        if offset is not None and series.size:
+            dtype = series.dtype.newbyteorder(tif.byteorder)
+            shape = series.shape
+        else:
+            offset = None
+    if offset is None:
+        return tifffile.imread(tiff_file)
+    return np.memmap(tiff_file, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+def estimate_job_memory(file, streaming=True, fragments=None):
+    """Estimate the peak RAM (bytes) of concatenating a recording, from its fragment headers only
+
+    Streaming holds one decoded fragment at a time, the in-memory path holds the stack plus its concatenated copy.
+    """
+    frame_counts, frame_shape, dtype = read_fragment_shapes(fragments or list_fragments(file))
+    frame_bytes = int(np.prod(frame_shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+    if streaming:
+        return max(frame_counts) * frame_bytes
+    return 2 * sum(frame_counts) * frame_bytes
+
+
+def partial_paths(output_path):
+    """Temporary output written during concatenation and its checkpoint (renamed/removed when complete)"""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.name}.part"), output_path.with_name(f"{output_path.name}.part.json")
+
+
+def load_checkpoint(checkpoint_path):
+    try:
+        with open(checkpoint_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    temp_path = Path(f"{checkpoint_path}.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, checkpoint_path)
+
+
+def stream_fragments(all_files, output_path, report=print, output=None, timer=None, on_fragment=None):
+    """Copy fragments one by one into a preallocated uncompressed TIFF, so only one fragment is held in RAM at a time
+
+    The stack is built in m_name.tif.part and renamed when complete. After each fragment the data is flushed
+    and m_name.tif.part.json records it, so an interrupted (or cancelled) job resumes from the last finished
+    fragment. on_fragment(done, total) is called after each fragment. Returns the number of image bytes written.
+    """
+    output = output or DEFAULT_OUTPUT
+    timer = timer or StageTimer()
+    file_options, _ = writer_options(output)
+    with timer.stage("scan"):
+        frame_counts, frame_shape, dtype = read_fragment_shapes(all_files)
+        sources = source_signature(all_files)
+    shape = (sum(frame_counts), *frame_shape)
+    temp_path, checkpoint_path = partial_paths(output_path)
+    checkpoint = {
+        "sources": sources,
+        "format": output["format"],
+        "shape": list(shape),
+        "dtype": str(dtype),
+        "fragments_done": 0,
+    }
+
+    # Resume only if the previous attempt was made from exactly the same fragments
+    previous = load_checkpoint(checkpoint_path)
+    start = 0
+    if temp_path.exists() and {**previous, "fragments_done": 0} == checkpoint:
+        try:
+            stacked_data = tifffile.memmap(str(temp_path), mode="r+")
+        except Exception as e:
+            # Truncated or corrupt partial output (e.g. a crash mid-write): start over instead of failing every run
+            report(f"{Path(output_path).name}: cannot resume from {temp_path.name} ({e}), restarting", "yellow")
+            temp_path.unlink(missing_ok=True)
+            checkpoint_path.unlink(missing_ok=True)
+            stacked_data = None
+        if stacked_data is not None and stacked_data.shape == shape:
+            start = previous["fragments_done"]
+            report(f"{Path(output_path).name}: resuming from fragment {start + 1}/{len(all_files)}", "yellow")
+        else:
+            del stacked_data
+
+    if start == 0:
+        # Output is sized from the summed fragment shapes and filled in place through a memory map
+        with timer.stage("write"):
+            stacked_data = tifffile.memmap(
+                str(temp_path),
+                shape=shape,
+                dtype=dtype,
+                metadata={"axes": "TYX"},
+                photometric="minisblack",
+                **file_options,
+            )
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    offset = sum(frame_counts[:start])
+    for i in range(start, len(all_files)):
+        n_frames = frame_counts[i]
+        with timer.stage("read"):
+            data = read_fragment(all_files[i])
+        # Memory-mapped fragments are paged in here, so their disk reads count as copy time
+        with timer.stage("copy"):
+            stacked_data[offset : offset + n_frames] = data.reshape(n_frames, *frame_shape)
+        offset += n_frames
+        del data
+
+        # Data must reach the disk before the checkpoint claims it
+        with timer.stage("write"):
+            stacked_data.flush()
+            checkpoint["fragments_done"] = i + 1
+            save_checkpoint(checkpoint_path, checkpoint)
+        if on_fragment:
+            on_fragment(i + 1, len(all_files))
+
+    with timer.stage("write"):
+        del stacked_data
+        os.replace(temp_path, output_path)
+        os.remove(checkpoint_path)
+    return int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+
+
+def iter_chunks(all_files, frame_counts, frame_shape, tile=None, timer=None, on_fragment=None):
+    """Yield the frames of every fragment in order, or their tiles (zero padded at the edges) when tiling"""
+    timer = timer or StageTimer()
+    for i, (tiff_file, n_frames) in enumerate(zip(all_files, frame_counts)):
+        with timer.stage("read"):
+            data = read_fragment(tiff_file).reshape(n_frames, *frame_shape)
+        for frame in data:
+            if tile is None:
+                yield frame
+                continue
+            for y in range(0, frame_shape[0], tile[0]):
+                for x in range(0, frame_shape[1], tile[1]):
+                    chunk = frame[y : y + tile[0], x : x + tile[1]]
+                    if chunk.shape != tuple(tile):
+                        chunk = np.pad(chunk, ((0, tile[0] - chunk.shape[0]), (0, tile[1] - chunk.shape[1])))
+                    yield chunk
+        del data
+        if on_fragment:
+            on_fragment(i + 1, len(all_files))
+
+
+def encode_fragments(all_files, output_path, output, timer=None, on_fragment=None):
+    """Stream fragments through TiffWriter to write compressed and/or tiled stacks, one fragment in RAM at a time
+
+    Encoded pages cannot be preallocated and filled in place, so unlike stream_fragments an interrupted job
+    restarts from the first fragment (its partial output is removed). tifffile compresses the strips/tiles of
+    consecutive pages in its own thread pool. Returns the number of image bytes written.
+    """
+    timer = timer or StageTimer()
+    file_options, page_options = writer_options(output)
+    with timer.stage("scan"):
+        frame_counts, frame_shape, dtype = read_fragment_shapes(all_files)
+    shape = (sum(frame_counts), *frame_shape)
+    temp_path, _ = partial_paths(output_path)
+
+    # TiffWriter pulls the fragments while it writes, the time spent reading them (or paused between them)
+    # is moved out of the write stage
+    pulled_before = timer.stages["read"] + timer.stages["paused"]
+    with timer.stage("write"):
+        try:
+            with tifffile.TiffWriter(str(temp_path), **file_options) as tif:
+                tif.write(
+                    iter_chunks(all_files, frame_counts, frame_shape, page_options.get("tile"), timer, on_fragment),
+                    shape=shape,
+                    dtype=dtype,
+                    **page_options,
+                )
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        os.replace(temp_path, output_path)
+    timer.stages["write"] -= timer.stages["read"] + timer.stages["paused"] - pulled_before
+    return int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+
+
+def stack_in_memory(all_files, output_path, output=None, timer=None, on_fragment=None):
+    """Read full files and append them in RAM before writing (needs about twice the final stack size)"""
+    timer = timer or StageTimer()
+    # metadata=None prevents writing incorrect frame count from first fragment
+    for i, tiff_file in enumerate(all_files):
+        with timer.stage("read"):
+            data = read_fragment(tiff_file)
+        # First file creates, rest append
+        with timer.stage("copy"):
+            if i == 0:
+                stacked_data = data
+            else:
+                stacked_data = np.concatenate((stacked_data, data), axis=0)
+        if on_fragment:
+            on_fragment(i + 1, len(all_files))
+
+    # Written under a temporary name, so a crash never leaves a truncated m_name.tif behind
+    temp_path, _ = partial_paths(output_path)
+    file_options, page_options = writer_options(output or DEFAULT_OUTPUT)
+    with timer.stage("write"):
+        tifffile.imwrite(str(temp_path), stacked_data, **file_options, **page_options)
+        raw_bytes = stacked_data.nbytes
+        del data, stacked_data
+        os.replace(temp_path, output_path)
+    return raw_bytes
+
+
+def concatenate_recording(
+    file, streaming=True, report=print, fragments=None, output=None, job_control=None, job_progress=None
+):
+    """Concatenate name.tif and its name@NNNN.tif fragments into merged/m_name.tif
+
+    report(message, color) is called with the result, so the same code runs in threads, processes or a console.
+    fragments is the ordered fragment list (e.g. from FragmentIndex); the directory is globbed when it is None.
+    output holds the format, compression and tiling of the merged stack (see output_options).
+    job_control (JobControl) pauses or cancels the job between fragments, job_progress(done, total) follows it.
+    Returns the timing report of the job (see StageTimer.report), None if it failed; raises StackCancelled.
+    """
+    output = output or DEFAULT_OUTPUT
+    timer = StageTimer()
+    img_basename = Path(file).stem
+    all_files = fragments or list_fragments(file)
+    # Merged folder is in the file's parent directory
+    output_path = merged_output_path(file, output)
+    original_stat = os.stat(file)
+
+    def on_fragment(done, total):
+        if job_progress:
+            job_progress(done, total)
+        if job_control:
+            # Time spent paused is kept out of the stage timings and the throughput
+            with timer.stage("paused"):
+                job_control.checkpoint()
+
+    try:
+        t_start = time()
+        # A job submitted just before a pause waits here, before touching the output
+        on_fragment(0, len(all_files))
+
+        if not compression_available(output["compression"]):
+            raise ValueError(f"{output['compression']} compression requires the imagecodecs package")
+
+        if not streaming:
+            raw_bytes = stack_in_memory(all_files, output_path, output, timer, on_fragment)
+        elif output["compression"] or output["tile"]:
+            raw_bytes = encode_fragments(all_files, output_path, output, timer, on_fragment)
+        else:
+            raw_bytes = stream_fragments(all_files, output_path, report, output, timer, on_fragment)
+
+        with timer.stage("utime"):
+            os.utime(str(output_path), (original_stat.st_atime, original_stat.st_mtime))
+        elaspse = time() - t_start - timer.stages["paused"]
+        output_size = os.path.getsize(output_path)
+        message = f"{img_basename} is concatenated. Time used: {elaspse:.2f} seconds"
+        message += f" ({raw_bytes / 1024**2 / max(elaspse, 1e-6):.1f} MB/s)."
+        if output["compression"]:
+            message += (
+                f" {raw_bytes / 1024**2:.1f} MB -> {output_size / 1024**2:.1f} MB,"
+                f" {(1 - output_size / max(raw_bytes, 1)) * 100:.1f}% saved."
+            )
+        report(message, "aquamarine")
+        return timer.report(output_path.name, raw_bytes, output_size, elaspse)
+
+    except StackCancelled:
+        report(f"{img_basename} is cancelled.", "yellow")
+        raise
+
+    except Exception as e:
+        report(f"Error processing {img_basename}: {e}", "red")
+        return None
+
+
+class StageTimer:
+    """Wall time spent in each stage of a stacking job (header scan, read, copy, write, utime)"""
+
+    def __init__(self):
+        self.stages = dict.fromkeys(STAGES + ("paused",), 0.0)
+
+    @contextmanager
+    def stage(self, name):
+        t_start = perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += perf_counter() - t_start
+
+    def report(self, output_name, raw_bytes, output_bytes, elapsed):
+        """JSON friendly timing report of one job, MB/s are image MB over each stage's time"""
+        return {
+            "output": output_name,
+            "raw_bytes": raw_bytes,
+            "output_bytes": output_bytes,
+            "elapsed": elapsed,
+            "stages": dict(self.stages),
+            "mb_per_s": {
+                "total": raw_bytes / 1024**2 / elapsed if elapsed > 0 else None,
+                **{
+                    name: raw_bytes / 1024**2 / self.stages[name] if self.stages[name] > 0 else None
+                    for name in ("read", "copy", "write")
+                },
+            },
+        }
+
+
+def summarize_timings(timings, wall_time=None):
+    """Add up the timing reports of a run: total bytes, seconds per stage (summed over jobs) and MB/s
+
+    Jobs run in parallel, so the run throughput (mb_per_s) divides by the wall-clock time of the run; without it,
+    only the per-job throughput (bytes over the summed job times, job_mb_per_s) is known.
+    """
+    raw_bytes = sum(timing["raw_bytes"] for timing in timings)
+    elapsed = sum(timing["elapsed"] for timing in timings)
+    return {
+        "files": len(timings),
+        "raw_bytes": raw_bytes,
+        "output_bytes": sum(timing["output_bytes"] for timing in timings),
+        "elapsed": elapsed,
+        "wall_time": wall_time,
+        "stages": {name: sum(timing["stages"][name] for timing in timings) for name in STAGES},
+        "job_mb_per_s": raw_bytes / 1024**2 / elapsed if elapsed > 0 else None,
+        "mb_per_s": raw_bytes / 1024**2 / wall_time if wall_time else None,
+    }
+
+
+def timing_table_rows(timings, wall_time=None):
+    """Rows (one per job plus a total) for printing timing reports with tabulate
+
+    The total row uses the wall-clock time of the run when given, otherwise it shows the per-job throughput.
+    """
+    summary = summarize_timings(timings, wall_time)
+    total_name = "Total" if wall_time else "Total (per job)"
+    if wall_time:
+        summary = summary | {"elapsed": wall_time}
+    rows = []
+    for name, timing in [(t["output"], t) for t in timings] + [(total_name, summary)]:
+        elapsed = timing["elapsed"]
+        rows.append(
+            {
+                "File": name,
+                "MB": f"{timing['raw_bytes'] / 1024**2:.1f}",
+                **{stage.capitalize(): f"{timing['stages'][stage]:.2f}" for stage in STAGES},
+                "Time (s)": f"{elapsed:.2f}",
+                "MB/s": f"{timing['raw_bytes'] / 1024**2 / elapsed:.1f}" if elapsed > 0 else "-",
+            }
+        )
+    return rows
+
+
+def save_timing_report(directory, timings, run_info, wall_time):
+    """Write stack_timing_<date>-<time>.json next to merged/, to compare runs across machines and disks"""
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        **run_info,
+        "wall_time": wall_time,
+        "summary": summarize_timings(timings, wall_time),
+        "jobs": timings,
+    }
+    # Runs finishing in the same second get a -2, -3... suffix instead of overwriting each other's report
+    stem = f"stack_timing_{datetime.now():%Y%m%d-%H%M%S}"
+    suffix = 1
+    while True:
+        report_path = Path(directory) / (f"{stem}.json" if suffix == 1 else f"{stem}-{suffix}.json")
+        try:
+            with open(report_path, "x") as f:
+                json.dump(report, f, indent=4)
+        except FileExistsError:
+            suffix += 1
+            continue
+        return report_path
@@ -84,10 +84,12 @@ class Main:
         self.ui.show()
 
 
-if sys.platform == "win32":
-    sys.argv += ["-platform", "windows:darkmode=0"]
-
-app = QApplication(sys.argv)
-app.setStyle("Fusion")
-window = Main()
-app.exec()
+# The guard keeps process-pool workers (which re-import this module on Windows) from opening the GUI
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        sys.argv += ["-platform", "windows:darkmode=0"]
+
+    app = QApplication(sys.argv)
+    app.setStyle("Fusion")
+    window = Main()
+    app.exec()
@@ -0,0 +1,123 @@
+"""Headless TIFF stacker: concatenate the PCO fragments of a directory without starting the GUI
+
+Usage:
+    python stack.py <dir> [--recursive] [--workers N] [--backend process] [--format ome] [--compression zlib]
+    python -m stack <dir> ...
+
+Recordings are grouped exactly like the Tiff Stacker tab (FragmentIndex.discrete_recordings) and stacked by the
+same StackEngine, so outputs, manifests and timing reports are interchangeable with GUI runs.
+"""
+
+## Modules
+# Standard library imports
+import argparse
+import sys
+from pathlib import Path
+
+# Third-party imports
+from rich import print
+from tabulate import tabulate
+
+# Local application imports
+from functions.fragment_index import FragmentIndex
+from functions.stack_engine import StackEngine, format_eta
+from functions.system_resources import available_memory, suggest_worker_count
+from functions.tiff_stacking import OUTPUT_FORMATS, compression_available, output_options, timing_table_rows
+
+# Same index as the GUI (util.constants.MODELS_DIR), not imported from there to keep the command line Qt-free
+FRAGMENT_INDEX_DB = Path(__file__).parent / "data" / "fragment_index.db"
+WORKER_MEMORY = 2 * 1024**3  # Assumed RAM per worker when --workers is not given (util.constants.STACKER_WORKER_MEMORY)
+TILE = (256, 256)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="stack", description="Concatenate PCO TIFF fragments into merged/m_*.tif")
+    parser.add_argument("directory", type=Path, help="folder containing name.tif and name@NNNN.tif fragments")
+    parser.add_argument("-r", "--recursive", action="store_true", help="include sub-directories")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="parallel jobs (default: fits CPU and RAM)")
+    parser.add_argument("--disk-workers", type=int, default=2, help="parallel jobs per storage device")
+    parser.add_argument("--backend", choices=("thread", "process"), default="thread")
+    parser.add_argument("--ram-budget", type=float, default=None, help="RAM budget in GB (default: 80%% of free)")
+    parser.add_argument("--in-memory", action="store_true", help="stack each recording in RAM before writing")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS.keys(), default="imagej")
+    parser.add_argument("--compression", choices=("zlib", "zstd", "lzw"), default=None)
+    parser.add_argument("--tiles", action="store_true", help=f"write {TILE[0]}x{TILE[1]} tiles")
+    parser.add_argument("--no-skip", action="store_true", help="re-stack outputs that are up to date")
+    parser.add_argument("--hash", action="store_true", help="add a fast hash to the up-to-date check")
+    parser.add_argument("--timing-report", action="store_true", help="save a JSON timing report next to merged/")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    root = args.directory.resolve()
+    if not root.is_dir():
+        print(f"[red]Not a directory: {root}[/red]")
+        return 2
+    if not compression_available(args.compression):
+        print(f"[red]{args.compression} compression requires the imagecodecs package (pip install imagecodecs)[/red]")
+        return 2
+
+    fragment_index = FragmentIndex(FRAGMENT_INDEX_DB)
+    fragment_index.update_tree(str(root), recursive=args.recursive)
+    recordings = fragment_index.discrete_recordings(str(root), recursive=args.recursive)
+    if not recordings:
+        print(f"[yellow]No discrete .tif files found in {root}[/yellow]")
+        return 0
+
+    files_by_dir = {}
+    for recording in recordings:
+        files_by_dir.setdefault(str(Path(recording).parent), []).append(recording)
+    print(f"[cyan]Found {len(recordings)} discrete TIFF file(s) in {len(files_by_dir)} director(ies)[/cyan]")
+
+    if args.ram_budget is not None:
+        memory_budget = int(args.ram_budget * 1024**3)
+    else:
+        free_memory = available_memory()
+        memory_budget = int(free_memory * 0.8) if free_memory else None
+
+    def report(message, color):
+        print(f"[{color}]{message.replace('<br>', '')}[/{color}]")
+
+    # Progress is printed when the percentage changes, together with the throughput that follows it
+    last_progress = {"percentage": None, "printed": None}
+
+    def progress(percentage):
+        last_progress["percentage"] = percentage
+
+    def throughput(rate, eta):
+        if last_progress["percentage"] == last_progress["printed"]:
+            return
+        last_progress["printed"] = percentage = last_progress["percentage"]
+        print(f"[cyan]Progress: {percentage}%  {rate / 1024**2:.1f} MB/s  ETA {format_eta(eta)}[/cyan]")
+
+    engine = StackEngine(
+        files_by_dir,
+        str(root),
+        max_workers=args.workers or suggest_worker_count(WORKER_MEMORY),
+        streaming=not args.in_memory,
+        backend=args.backend,
+        device_workers=args.disk_workers,
+        memory_budget=memory_budget,
+        fragments_by_file=recordings,
+        skip_up_to_date=not args.no_skip,
+        verify_hash=args.hash,
+        output=output_options(args.format, args.compression, TILE if args.tiles else None),
+        timing_report=args.timing_report,
+        report=report,
+        progress=progress,
+        throughput=throughput,
+    )
+    engine.run()
+
+    if engine.timings:
+        rows = timing_table_rows(list(engine.timings.values()), engine.wall_time)
+        print(tabulate(rows, headers="keys", tablefmt="pretty", disable_numparse=True))
+    if engine.failed:
+        print(f"[red]{len(engine.failed)} file(s) failed[/red]")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -149,6 +149,33 @@ SERIAL_NAME_FORMAT = "{date}-{serial:04d}.tif"
 DATE_FORMAT = "%Y%m%d"
 DISPLAY_DATE_FORMAT = "%Y_%m_%d"
 
+# Directory Watcher
+DIRWATCHER_DEBOUNCE_MS = 300  # Quiet time after a directory event before rescanning (bursts coalesce into one scan)
+DIRWATCHER_MAX_DELAY_MS = 2000  # Longest a continuous burst of events can postpone the rescan
+DIRWATCHER_MAX_DIRS = 512  # Most directories a recursive DirWatcher registers (OS watch handles are limited)
+DIRWATCHER_BACKEND = "auto"  # "native" (file system events), "polling", or "auto" (polling on network shares)
+DIRWATCHER_POLL_MIN_MS = 500  # Polling interval during activity
+DIRWATCHER_POLL_MAX_MS = 16000  # Polling interval once idle (doubles from the minimum), with a full rescan
+
+# REC Import
+REC_IMPORT_WORKERS = 8  # Concurrent .rec reads of an import (latency bound on network shares, not CPU bound)
+REC_IMPORT_VERIFY_HASH = False  # Incremental imports also hash unchanged files, to catch edits that kept the mtime
+
+# TIFF Stacker
+STACKER_BACKENDS = {"Threads": "thread", "Processes": "process"}  # display name: ThreadTiffStacker backend
+STACKER_WORKER_MEMORY = 2 * 1024**3  # Assumed RAM per worker (about one fragment) for auto-sizing the worker count
+STACKER_DISK_WORKERS = 2  # Default number of concurrent jobs reading from the same storage device
+STACKER_FORMATS = {"ImageJ": "imagej", "BigTIFF": "bigtiff", "OME-TIFF": "ome"}  # display name: output format
+STACKER_COMPRESSIONS = {"None": None, "zlib": "zlib", "zstd": "zstd", "LZW": "lzw"}  # display name: TIFF compression
+STACKER_TILE = (256, 256)  # Tile size of tiled outputs (pixels, multiple of 16)
+STACKER_LIVE_INTERVAL_MS = 5000  # Rescan interval of live stacking (fragment sizes change without a dir event)
+STACKER_LIVE_STABLE_SECONDS = 30  # A recording without .rec is complete once its fragments are unchanged this long
+STACKER_LIVE_RETRIES = 3  # A recording whose live stacking failed this many times is left to the batch stacker
+TIFF_PREVIEW_SIZE = 48  # Thumbnail size (pixels) of recordings in the stacker list
+TIFF_PREVIEW_TRACE_WIDTH = 140  # Width (pixels) of the frame count and mean-intensity trace in the stacker list
+TIFF_PREVIEW_SAMPLES = 3  # Frames read per fragment for the preview trace
+TIFF_PREVIEW_WORKERS = 2  # Concurrent preview readers, low so that previews do not compete with stacking jobs
+
 # Default Values
 DEFAULTS = {
     "SERIAL": 0,
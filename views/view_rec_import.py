@@ -1,3 +1,6 @@
+# Standard library imports
+from datetime import datetime
+
 # Third-party imports
 from PySide6.QtWidgets import QAbstractItemView, QHeaderView
 
@@ -15,6 +18,7 @@ class ViewRecImport:
         self.setup_buttons()
         self.setup_tableview()
         self.setup_groupbox()
+        self.setup_query_bar()
 
     def setup_tableview(self):
         self.ui.tv_recDb.horizontalHeader().setDefaultAlignment(UIAlignments.CENTER)
@@ -27,12 +31,24 @@ class ViewRecImport:
         buttons_small = [
             self.ui.btn_deleteTable,
             self.ui.btn_exportSummary,
+            self.ui.btn_recDbQuery,
         ]
 
         for btn in buttons_small:
             btn.setFixedSize(UISizes.BUTTON_SMALL)
 
         self.ui.btn_importRecDb.setFixedHeight(UISizes.BUTTON_LONG_HEIGHT)
+        self.ui.btn_recDbShowTable.setFixedHeight(UISizes.BUTTON_SMALL.height())
 
     def setup_groupbox(self):
         self.ui.gb_recDB_status.setFixedHeight(UISizes.GROUP_BOX_STATUS_HEIGHT)
+
+    def setup_query_bar(self):
+        # Date range defaults to this year, used only when chk_recDbDateRange is checked
+        today = datetime.today()
+        self.ui.de_recDbFrom.setDate(today.replace(month=1, day=1))
+        self.ui.de_recDbTo.setDate(today)
+        self.ui.de_recDbFrom.setDisplayFormat("yyyy-MM-dd")
+        self.ui.de_recDbTo.setDisplayFormat("yyyy-MM-dd")
+        self.ui.de_recDbFrom.setEnabled(False)
+        self.ui.de_recDbTo.setEnabled(False)
@@ -1,7 +1,20 @@
+# Standard library imports
+import os
+
 # Third-party imports
+from PySide6.QtWidgets import QAbstractItemView, QHeaderView
+
 # Local application imports
 from classes import DelegateCheckableListItem
-from util.constants import UISizes
+from functions.system_resources import available_memory, suggest_worker_count
+from util.constants import (
+    STACKER_BACKENDS,
+    STACKER_COMPRESSIONS,
+    STACKER_DISK_WORKERS,
+    STACKER_FORMATS,
+    STACKER_WORKER_MEMORY,
+    UISizes,
+)
 
 
 class ViewTiffStacker:
@@ -14,10 +27,14 @@ class ViewTiffStacker:
         self.setup_groupbox()
         self.setup_progressbar()
         self.setup_pushbuttons()
+        self.setup_stacker_options()
+        self.setup_job_table()
 
     def setup_listview(self):
-        checkbox_delegate = DelegateCheckableListItem()
+        checkbox_delegate = DelegateCheckableListItem(show_previews=True)
         self.ui.lv_tiffFiles.setItemDelegate(checkbox_delegate)
+        # Every row has the same height, so the view lays out long lists without asking each row's size
+        self.ui.lv_tiffFiles.setUniformItemSizes(True)
 
     def setup_groupbox(self):
         self.ui.gb_concat_status.setFixedHeight(2 * UISizes.GROUP_BOX_STATUS_HEIGHT)
@@ -28,3 +45,27 @@ class ViewTiffStacker:
     def setup_pushbuttons(self):
         self.ui.btn_browseTiffs.setFixedSize(UISizes.BUTTON_SMALL)
         self.ui.btn_startConcat.setFixedHeight(UISizes.BUTTON_LONG_HEIGHT)
+        self.ui.btn_pauseConcat.setFixedHeight(UISizes.BUTTON_LONG_HEIGHT)
+        self.ui.btn_cancelConcat.setFixedHeight(UISizes.BUTTON_LONG_HEIGHT)
+
+    def setup_stacker_options(self):
+        self.ui.sb_stackerWorkers.setRange(1, os.cpu_count() or 1)
+        self.ui.sb_stackerWorkers.setValue(suggest_worker_count(STACKER_WORKER_MEMORY))
+        self.ui.sb_stackerDiskWorkers.setRange(1, os.cpu_count() or 1)
+        self.ui.sb_stackerDiskWorkers.setValue(STACKER_DISK_WORKERS)
+        self.ui.cb_stackerBackend.addItems(STACKER_BACKENDS.keys())
+        self.ui.cb_stackerFormat.addItems(STACKER_FORMATS.keys())
+        self.ui.cb_stackerCompression.addItems(STACKER_COMPRESSIONS.keys())
+
+        # Default RAM budget is 80% of the memory available at startup
+        free_memory_gb = (available_memory() or 0) / 1024**3
+        self.ui.sb_stackerRamBudget.setRange(1, 1024)
+        self.ui.sb_stackerRamBudget.setValue(max(1, int(free_memory_gb * 0.8)))
+
+    def setup_job_table(self):
+        self.ui.tv_stackerJobs.verticalHeader().setVisible(False)
+        self.ui.tv_stackerJobs.setSelectionMode(QAbstractItemView.NoSelection)
+        self.ui.tv_stackerJobs.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.ui.tv_stackerJobs.horizontalHeader().setStretchLastSection(True)
+        # Log on top, job queue below
+        self.ui.splitter_stackerStatus.setSizes([UISizes.GROUP_BOX_STATUS_HEIGHT, UISizes.GROUP_BOX_STATUS_HEIGHT])